@@ -3,7 +3,8 @@
 """
 Compass event sender
 
-Sends compass events via EventAdmin every second.
+Sends compass events via EventAdmin when the phone moves, reading the sensor
+at a rate depending on its movements (see compass.throttle).
 
 :author: Thomas Calmant
 :copyright: Copyright 2013, isandlaTech
@@ -21,9 +22,11 @@ __docformat__ = "restructuredtext en"
 
 # ------------------------------------------------------------------------------
 
+# Local package
+from compass.throttle import AngleThrottle, compute_angle
+
 # Kivy
 from kivy.clock import Clock
-from kivy.vector import Vector
 
 # Pelix
 from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
@@ -33,6 +36,7 @@ import pelix.services
 
 # Standard library
 import logging
+import time
 
 # ------------------------------------------------------------------------------
 
@@ -48,6 +52,11 @@ _logger = logging.getLogger(__name__)
 @Requires('_event', pelix.services.SERVICE_EVENT_ADMIN)
 @Requires('_hardware', "android.hardware")
 @Property('_tick', 'clock.tick', 1.0)
+@Property('_slow_tick', 'clock.tick.still', 1.0)
+@Property('_still_delay', 'clock.still.delay', 2.0)
+@Property('_threshold', 'angle.threshold', 2.0)
+@Property('_keepalive', 'angle.keepalive', 30.0)
+@Property('_trace_path', 'angle.trace.path')
 @Property('_export_config', pelix.remote.PROP_EXPORTED_CONFIGS, ["jsonrpc"])
 @Property('_export_interface', pelix.remote.PROP_EXPORTED_INTERFACES,
           [SVC_COMPASS])
@@ -65,8 +74,23 @@ class CompassEventSender(object):
         # Hardware
         self._hardware = None
 
-        # Clock tick time
+        # Clock tick time, while moving and while still
         self._tick = 1.0
+        self._slow_tick = 1.0
+
+        # Time without move before using the slow tick
+        self._still_delay = 2.0
+
+        # Minimal angle change to send and maximal delay between two events
+        self._threshold = 2.0
+        self._keepalive = 30.0
+
+        # Readings trace file (path and file)
+        self._trace_path = None
+        self._trace = None
+
+        # Events throttle
+        self._throttle = None
 
         # Export properties
         self._export_config = None
@@ -77,15 +101,20 @@ class CompassEventSender(object):
         """
         Notified of a clock tick
         """
-        if self._event is None:
+        if self._event is None or self._throttle is None:
             # Late tick
             return False
 
         # Compute the angle
         angle = self.get_angle()
 
-        # Post the event
-        self._event.post(ANGLE_TOPIC, {"angle": angle})
+        # Post the event, if necessary
+        send, delay = self._throttle.update(angle, time.time())
+        if send:
+            self._event.post(ANGLE_TOPIC, {"angle": angle})
+
+        # Schedule the next reading
+        Clock.schedule_once(self._clock_tick, delay)
         return True
 
 
@@ -96,8 +125,13 @@ class CompassEventSender(object):
         :return: A float angle in degrees
         """
         # Compute the angle (from the Kivy compass example)
-        (x, y, _) = self._hardware.magneticFieldSensorReading()
-        return Vector(x, y).angle((0, 1))
+        (x, y, z) = self._hardware.magneticFieldSensorReading()
+        if self._trace is not None:
+            # Record the reading
+            self._trace.write("{0:.3f},{1},{2},{3}\n"
+                              .format(time.time(), x, y, z))
+
+        return compute_angle(x, y)
 
 
     @Validate
@@ -105,11 +139,20 @@ class CompassEventSender(object):
         """
         Component validated
         """
+        # Prepare the throttle
+        self._throttle = AngleThrottle(self._threshold, self._tick,
+                                       self._slow_tick, self._still_delay,
+                                       self._keepalive)
+
+        if self._trace_path:
+            # Record the readings, to be replayed by replay_trace.py
+            self._trace = open(self._trace_path, "a")
+
         # Start the sensor
         self._hardware.magneticFieldSensorEnable(True)
 
         # Schedule the Kivy clock
-        Clock.schedule_interval(self._clock_tick, self._tick)
+        Clock.schedule_once(self._clock_tick, self._tick)
 
 
     @Invalidate
@@ -122,3 +165,11 @@ class CompassEventSender(object):
 
         # Stop the sensor
         self._hardware.magneticFieldSensorEnable(False)
+
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
+
+        _logger.debug("Compass readings: %d - sent events: %d",
+                      self._throttle.readings, self._throttle.sent)
+        self._throttle = None
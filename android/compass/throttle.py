@@ -0,0 +1,135 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Compass events throttling
+
+Decides which compass readings must be sent and when the next reading must
+be done. Doesn't depend on Kivy nor on Android: it can be used off-device,
+e.g. to replay recorded readings.
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Standard library
+import math
+
+# ------------------------------------------------------------------------------
+
+def compute_angle(x, y):
+    """
+    Computes the angle of the magnetic field in the phone plane, as
+    kivy.vector.Vector(x, y).angle((0, 1)) does
+
+    :param x: Magnetic field along the X axis
+    :param y: Magnetic field along the Y axis
+    :return: A float angle in degrees, in ]-180, 180]
+    """
+    return -math.degrees(math.atan2(x, y))
+
+
+def angle_distance(first, second):
+    """
+    Computes the distance between two angles, along the shortest arc
+
+    :param first: An angle in degrees
+    :param second: Another angle in degrees
+    :return: A distance in degrees, in [0, 180]
+    """
+    delta = abs(first - second) % 360
+    return 360 - delta if delta > 180 else delta
+
+# ------------------------------------------------------------------------------
+
+class AngleThrottle(object):
+    """
+    Dead-band and adaptive rate throttle:
+
+    * an angle is sent only if it differs from the last sent one by more than
+      the threshold, or if nothing has been sent since the keep-alive delay;
+    * readings are done every fast tick while the phone moves, and every slow
+      tick once it didn't move for the still delay.
+
+    The slow tick adds latency: a move starting right after a reading made
+    while still is only seen at the next one, up to a slow tick later. Until
+    then, the consoles show the former angle: the error can reach the
+    rotation speed times the slow tick, i.e. about 120 degrees for a fast
+    turn with the default settings, while it stays below the threshold most
+    of the time (see replay_trace.py).
+    """
+    def __init__(self, threshold=2., fast_tick=.1, slow_tick=1.,
+                 still_delay=2., keepalive=30.):
+        """
+        Sets up members
+
+        :param threshold: Minimal angle change to send (in degrees)
+        :param fast_tick: Delay between two readings while moving (seconds)
+        :param slow_tick: Delay between two readings while still (seconds)
+        :param still_delay: Time without move before using the slow tick
+        :param keepalive: Maximum delay between two sent angles (seconds)
+        """
+        self.threshold = threshold
+        self.fast_tick = fast_tick
+        self.slow_tick = max(slow_tick, fast_tick)
+        self.still_delay = still_delay
+        self.keepalive = keepalive
+
+        # Last sent angle and its time
+        self._last_angle = None
+        self._last_sent = None
+
+        # Time of the last move
+        self._last_move = None
+
+        # Statistics
+        self.readings = 0
+        self.sent = 0
+
+
+    def reset(self):
+        """
+        Forgets the previous readings: the next one will be sent
+        """
+        self._last_angle = None
+        self._last_sent = None
+        self._last_move = None
+
+
+    def update(self, angle, now):
+        """
+        Handles a new reading
+
+        :param angle: The read angle (in degrees)
+        :param now: The reading time (in seconds)
+        :return: A (send, next tick delay) tuple
+        """
+        self.readings += 1
+
+        moved = self._last_angle is None \
+            or angle_distance(angle, self._last_angle) > self.threshold
+        if moved:
+            self._last_move = now
+
+        send = moved or now - self._last_sent >= self.keepalive
+        if send:
+            self.sent += 1
+            self._last_angle = angle
+            self._last_sent = now
+
+        if now - self._last_move < self.still_delay:
+            # Moving (or just stopped)
+            return send, self.fast_tick
+
+        return send, self.slow_tick
@@ -0,0 +1,251 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Compass readings replay
+
+Replays recorded magnetic field readings through the compass events throttle
+and compares the number of sent events with the former behavior (one event
+per fast clock tick, i.e. every ``--tick`` seconds). Also reports the
+percentiles of the error between the real angle and the last sent one.
+
+Traces are CSV files of "time,x,y,z" lines, recorded on the phone by setting
+the "angle.trace.path" property of the compass event sender. Without trace,
+a synthetic one is generated.
+
+Usage::
+
+    python replay_trace.py trace.csv [trace2.csv ...]
+    python replay_trace.py --synthetic 600
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Local package
+from compass.throttle import AngleThrottle, angle_distance, compute_angle
+
+# Standard library
+import argparse
+import bisect
+import math
+import random
+import sys
+
+# ------------------------------------------------------------------------------
+
+class FakeHardware(object):
+    """
+    Replays recorded readings, like the android.hardware service would give
+    them at a given time
+    """
+    def __init__(self, readings):
+        """
+        Sets up members
+
+        :param readings: A list of (time, x, y, z) tuples, sorted by time
+        """
+        self.readings = readings
+        self.__times = [reading[0] for reading in readings]
+        self.now = readings[0][0]
+
+
+    def magneticFieldSensorEnable(self, enable):
+        """
+        Enables or disables the sensor (does nothing)
+        """
+        pass
+
+
+    def magneticFieldSensorReading(self):
+        """
+        Returns the latest reading at the current time
+
+        :return: A (x, y, z) tuple
+        """
+        index = max(bisect.bisect_right(self.__times, self.now) - 1, 0)
+        return self.readings[index][1:]
+
+# ------------------------------------------------------------------------------
+
+def load_trace(path):
+    """
+    Loads a trace file
+
+    :param path: Path to a CSV trace file
+    :return: A list of (time, x, y, z) tuples, sorted by time
+    """
+    readings = []
+    with open(path) as trace:
+        for line in trace:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                readings.append(tuple(float(value)
+                                      for value in line.split(',')[:4]))
+
+    readings.sort()
+    return readings
+
+
+def make_trace(duration, rate=50.):
+    """
+    Makes a synthetic trace: the phone is still, with sensor noise, then
+    rotated, alternatively
+
+    :param duration: Duration of the trace (in seconds)
+    :param rate: Sensor readings per second
+    :return: A list of (time, x, y, z) tuples
+    """
+    readings = []
+    angle = random.uniform(0, 360)
+    speed = 0
+    phase_end = 0
+    now = 0.
+    while now < duration:
+        if now >= phase_end:
+            # Next phase: still (2/3 of the time) or rotating
+            if random.random() < .66:
+                speed = 0
+                phase_end = now + random.uniform(5, 30)
+
+            else:
+                speed = random.choice((-1, 1)) * random.uniform(20, 180)
+                phase_end = now + random.uniform(1, 5)
+
+        angle += speed / rate
+        noisy = math.radians(angle + random.gauss(0, .5))
+        readings.append((now, -40 * math.sin(noisy), 40 * math.cos(noisy),
+                         -10.))
+        now += 1. / rate
+
+    return readings
+
+
+def percentile(values, ratio):
+    """
+    Returns the given percentile of sorted values (nearest rank)
+
+    :param values: A sorted list of values
+    :param ratio: The percentile, in [0, 1]
+    :return: The percentile value, or 0 without value
+    """
+    if not values:
+        return 0
+
+    return values[min(int(ratio * len(values)), len(values) - 1)]
+
+
+def replay(readings, options):
+    """
+    Replays readings through a throttle
+
+    :param readings: A list of (time, x, y, z) tuples
+    :param options: Parsed command line options
+    :return: A (readings, sent events, baseline events, errors) tuple,
+             where errors is the sorted list of the errors at each reading
+             (in degrees)
+    """
+    hardware = FakeHardware(readings)
+    throttle = AngleThrottle(options.threshold, options.tick,
+                             options.slow_tick, options.still_delay,
+                             options.keepalive)
+
+    # Clock simulation, as the Kivy clock would call the sender
+    start = readings[0][0]
+    end = readings[-1][0]
+    sent = []
+    hardware.now = start
+    while hardware.now <= end:
+        x, y, _ = hardware.magneticFieldSensorReading()
+        angle = compute_angle(x, y)
+        send, delay = throttle.update(angle, hardware.now)
+        if send:
+            sent.append((hardware.now, angle))
+
+        hardware.now += delay
+
+    # Error between the real angle and the one shown by the consoles
+    sent_times = [sent_time for sent_time, _ in sent]
+    errors = []
+    for reading in readings:
+        index = bisect.bisect_right(sent_times, reading[0]) - 1
+        if index >= 0:
+            errors.append(angle_distance(compute_angle(*reading[1:3]),
+                                         sent[index][1]))
+
+    # Former behavior: one event per fast tick
+    baseline = int((end - start) / options.tick) + 1
+    errors.sort()
+    return throttle.readings, len(sent), baseline, errors
+
+# ------------------------------------------------------------------------------
+
+def main(args=None):
+    """
+    Replays the given traces
+    """
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="Compass readings replay")
+    parser.add_argument("traces", nargs="*", metavar="TRACE",
+                        help="Recorded trace files")
+    parser.add_argument("--synthetic", type=float, default=600, metavar="SEC",
+                        help="Duration of the synthetic trace, if no trace "
+                        "file is given")
+    parser.add_argument("--tick", type=float, default=.1,
+                        help="Clock tick while moving (seconds)")
+    parser.add_argument("--slow-tick", type=float, default=1.,
+                        dest="slow_tick",
+                        help="Clock tick while still (seconds)")
+    parser.add_argument("--still-delay", type=float, default=2.,
+                        dest="still_delay",
+                        help="Time without move before using the slow tick")
+    parser.add_argument("--threshold", type=float, default=2.,
+                        help="Minimal angle change to send (degrees)")
+    parser.add_argument("--keepalive", type=float, default=30.,
+                        help="Maximal delay between two events (seconds)")
+    options = parser.parse_args(args)
+
+    if options.traces:
+        traces = [(path, load_trace(path)) for path in options.traces]
+
+    else:
+        traces = [("<synthetic>", make_trace(options.synthetic))]
+
+    print("settings: tick={0}s slow-tick={1}s still-delay={2}s "
+          "threshold={3} deg keepalive={4}s - baseline: one event per tick"
+          .format(options.tick, options.slow_tick, options.still_delay,
+                  options.threshold, options.keepalive))
+
+    for name, readings in traces:
+        if not readings:
+            print("{0}: empty trace".format(name))
+            continue
+
+        nb_readings, nb_sent, baseline, errors = replay(readings, options)
+        print("{0}: duration={1:.1f}s readings={2} events={3} "
+              "baseline={4} reduction={5:.1f}% "
+              "error: mean={6:.2f} p50={7:.2f} p95={8:.2f} p99={9:.2f} "
+              "max={10:.2f} deg"
+              .format(name, readings[-1][0] - readings[0][0], nb_readings,
+                      nb_sent, baseline,
+                      100. * (1 - float(nb_sent) / baseline),
+                      sum(errors) / len(errors) if errors else 0,
+                      percentile(errors, .5), percentile(errors, .95),
+                      percentile(errors, .99), percentile(errors, 1)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Benchmark scripts, to be executed from the ``pc`` folder, e.g.::
+
+    python -m benchmarks.qt_dispatch
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+
+def percentile(values, ratio):
+    """
+    Returns the value at the given ratio of a sorted list
+
+    :param values: A sorted list of values
+    :param ratio: A ratio between 0 and 1 (0.99 for the 99th percentile)
+    :return: The percentile value, or None for an empty list
+    """
+    if not values:
+        return None
+
+    return values[int(round(ratio * (len(values) - 1)))]
@@ -0,0 +1,192 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+CompassWidget paint benchmark
+
+Renders N frames of the compass widget offscreen, with a different angle for
+each frame, using the former paintEvent() (dial drawn at each frame, new
+polygons for the needle) and the current one (cached dial pixmap).
+
+Usage (from the ``pc`` folder)::
+
+    python -m benchmarks.compass_paint -n 10000
+
+Before measuring, the compass details rendering tick is run once after an
+angle event, to check it can drive the widget.
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Run without a display
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+# Local package
+from benchmarks import percentile
+from details.compass import CompassDetails
+from widgets.compass import CompassWidget
+
+# PyQt5
+import PyQt5.QtCore as QtCore
+import PyQt5.QtGui as QtGui
+import PyQt5.QtWidgets as QtWidgets
+
+# Standard library
+import argparse
+import sys
+import time
+
+# ------------------------------------------------------------------------------
+
+class LegacyCompassWidget(CompassWidget):
+    """
+    Compass widget using the former paint methods
+    """
+    def paintEvent(self, event):
+        """
+        Widget painting event
+        """
+        painter = QtGui.QPainter()
+        painter.begin(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.fillRect(event.rect(),
+                         self.palette().brush(QtGui.QPalette.Window))
+        self.drawMarkings(painter)
+        self.drawNeedle(painter)
+        painter.end()
+
+
+    def drawNeedle(self, painter):
+        """
+        Draws a needle, making its polygons
+        """
+        painter.save()
+        painter.translate(self.width() / 2, self.height() / 2)
+        painter.rotate(self._angle)
+        scale = min((self.width() - self._margins) / 120.0,
+                    (self.height() - self._margins) / 120.0)
+        painter.scale(scale, scale)
+
+        painter.setPen(QtGui.QPen(QtCore.Qt.NoPen))
+        painter.setBrush(self.palette().brush(QtGui.QPalette.Shadow))
+        painter.drawPolygon(
+            QtGui.QPolygon([QtCore.QPoint(-10, 0),
+                            QtCore.QPoint(0, -45),
+                            QtCore.QPoint(10, 0),
+                            QtCore.QPoint(0, 45),
+                            QtCore.QPoint(-10, 0)]))
+
+        painter.setBrush(QtGui.QBrush(QtGui.QColor(255, 0, 0)))
+        painter.drawPolygon(
+            QtGui.QPolygon([QtCore.QPoint(-5, -25),
+                            QtCore.QPoint(0, -45),
+                            QtCore.QPoint(5, -25),
+                            QtCore.QPoint(0, -30),
+                            QtCore.QPoint(-5, -25)]))
+        painter.restore()
+
+# ------------------------------------------------------------------------------
+
+def run(widget, nb_frames):
+    """
+    Renders the given number of frames of the widget in an image
+
+    :return: A tuple: (sorted frame durations, total duration)
+    """
+    image = QtGui.QImage(widget.size(),
+                         QtGui.QImage.Format_ARGB32_Premultiplied)
+
+    durations = []
+    start = time.time()
+    for i in range(nb_frames):
+        widget.setAngle(float(i % 360))
+
+        frame_start = time.time()
+        widget.render(image)
+        durations.append(time.time() - frame_start)
+
+    duration = time.time() - start
+    durations.sort()
+    return durations, duration
+
+
+def report(name, durations, duration):
+    """
+    Prints the results of a run
+    """
+    print("{0:8s} frames={1:6d} total={2:7.3f}s rate={3:9.1f} fps "
+          "p50={4:7.3f}ms p99={5:7.3f}ms"
+          .format(name, len(durations), duration,
+                  len(durations) / duration,
+                  percentile(durations, .5) * 1000,
+                  percentile(durations, .99) * 1000))
+
+# ------------------------------------------------------------------------------
+
+def check_render(smoothing):
+    """
+    Runs the compass details rendering tick once after an angle event
+
+    :param smoothing: Value of the 'compass.smoothing' property
+    :raise AssertionError: The needle didn't move as expected
+    """
+    details = CompassDetails()
+    details._smoothing = smoothing
+    widget = details.get_widget(None)
+    try:
+        details.handle_event("pelix/demo/compass/angle", {'angle': 90})
+        details._CompassDetails__render()
+
+        expected = 90 * smoothing if smoothing else 90
+        assert abs(widget.angle - expected) < 1e-6, \
+            "Needle at {0} instead of {1}".format(widget.angle, expected)
+
+    finally:
+        details.clean()
+        widget.deleteLater()
+
+
+def main(args=None):
+    """
+    Runs the benchmark
+    """
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="Compass paint benchmark")
+    parser.add_argument("-n", "--frames", type=int, default=10000,
+                        help="Number of frames to render")
+    parser.add_argument("-s", "--size", type=int, default=150,
+                        help="Size of the widget (in pixels)")
+    options = parser.parse_args(args)
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+    for smoothing in (0, .5):
+        check_render(smoothing)
+
+    for name, widget_class in (("legacy", LegacyCompassWidget),
+                               ("current", CompassWidget)):
+        widget = widget_class()
+        widget.resize(options.size, options.size)
+        report(name, *run(widget, options.frames))
+        widget.deleteLater()
+
+    app.processEvents()
+
+
+if __name__ == "__main__":
+    main()
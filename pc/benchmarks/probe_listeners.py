@@ -0,0 +1,256 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+BasicProbe listeners micro-benchmark
+
+Sends synthetic bundle and service events to the listeners of a BasicProbe
+(without a framework) and reports the time spent per event, with and
+without a subscribed event handler.
+
+Usage (from the ``pc`` folder)::
+
+    python -m benchmarks.probe_listeners -n 10000
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Local package
+import core.probe
+
+# Pelix
+import pelix.constants
+import pelix.framework
+import pelix.services
+
+# Standard library
+import argparse
+import sys
+import time
+
+# ------------------------------------------------------------------------------
+
+class FakeBundle(object):
+    """
+    Bundle description
+    """
+    def __init__(self, bid):
+        """
+        :param bid: Bundle ID
+        """
+        self.__bid = bid
+
+    def get_bundle_id(self):
+        """
+        Returns the bundle ID
+        """
+        return self.__bid
+
+    def get_symbolic_name(self):
+        """
+        Returns a symbolic name made from the bundle ID
+        """
+        return "fake.bundle.{0}".format(self.__bid)
+
+    def get_state(self):
+        """
+        Returns the ACTIVE state
+        """
+        return pelix.framework.Bundle.ACTIVE
+
+    def get_version(self):
+        """
+        Returns a constant version
+        """
+        return "1.0.0"
+
+
+class FakeReference(object):
+    """
+    Service reference
+    """
+    def __init__(self, properties):
+        """
+        :param properties: Service properties
+        """
+        self.__properties = properties
+
+    def get_property(self, key):
+        """
+        Returns the value of a service property, or None
+        """
+        return self.__properties.get(key)
+
+    def get_properties(self):
+        """
+        Returns a copy of the service properties
+        """
+        return self.__properties.copy()
+
+
+class FakeEvent(object):
+    """
+    Bundle or service event
+    """
+    def __init__(self, kind, bundle=None, reference=None):
+        """
+        :param kind: Kind of event
+        :param bundle: Bundle of a bundle event
+        :param reference: Service reference of a service event
+        """
+        self.__kind = kind
+        self.__bundle = bundle
+        self.__reference = reference
+
+    def get_kind(self):
+        """
+        Returns the kind of event
+        """
+        return self.__kind
+
+    def get_bundle(self):
+        """
+        Returns the bundle of a bundle event
+        """
+        return self.__bundle
+
+    def get_service_reference(self):
+        """
+        Returns the service reference of a service event
+        """
+        return self.__reference
+
+
+class FakeEventAdmin(object):
+    """
+    Counts posted events
+    """
+    def __init__(self):
+        """
+        Sets up the counter
+        """
+        self.posted = 0
+
+    def post(self, topic, properties):
+        """
+        Counts the event, ignoring its content
+        """
+        self.posted += 1
+
+
+class FakeContext(object):
+    """
+    Bundle context, ignoring listeners
+    """
+    def add_bundle_listener(self, listener):
+        """
+        Ignores the bundle listener
+        """
+        pass
+
+    def add_service_listener(self, listener):
+        """
+        Ignores the service listener
+        """
+        pass
+
+    def get_all_service_references(self, clazz, ldap_filter):
+        """
+        Returns None: no service is registered
+        """
+        return None
+
+# ------------------------------------------------------------------------------
+
+def make_events(count):
+    """
+    Prepares synthetic framework events
+
+    :param count: Number of events of each kind
+    :return: A tuple: (bundle events, service events)
+    """
+    bundle_kinds = (pelix.framework.BundleEvent.INSTALLED,
+                    pelix.framework.BundleEvent.STARTED,
+                    pelix.framework.BundleEvent.STOPPED,
+                    pelix.framework.BundleEvent.UNINSTALLED)
+    service_kinds = (pelix.framework.ServiceEvent.REGISTERED,
+                     pelix.framework.ServiceEvent.MODIFIED,
+                     pelix.framework.ServiceEvent.UNREGISTERING)
+
+    bundle_events = [FakeEvent(bundle_kinds[i % len(bundle_kinds)],
+                               bundle=FakeBundle(i))
+                     for i in range(count)]
+
+    service_events = []
+    for i in range(count):
+        properties = {pelix.constants.SERVICE_ID: i,
+                      pelix.constants.OBJECTCLASS: ["fake.service"],
+                      "fake.index": i, "fake.name": "service-{0}".format(i)}
+        service_events.append(FakeEvent(service_kinds[i % len(service_kinds)],
+                                        reference=FakeReference(properties)))
+
+    return bundle_events, service_events
+
+
+def run(events, listener):
+    """
+    Sends the events to the listener
+
+    :param events: A list of events
+    :param listener: A listener method, accepting an event
+    :return: The time spent per event, in microseconds
+    """
+    start = time.time()
+    for event in events:
+        listener(event)
+
+    return (time.time() - start) * 1000000 / len(events)
+
+# ------------------------------------------------------------------------------
+
+def main(args=None):
+    """
+    Runs the benchmark
+    """
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="Probe listeners benchmark")
+    parser.add_argument("-n", "--events", type=int, default=10000,
+                        help="Number of events of each kind")
+    options = parser.parse_args(args)
+
+    bundle_events, service_events = make_events(options.events)
+
+    for subscribed in (False, True):
+        probe = core.probe.BasicProbe()
+        probe._event = FakeEventAdmin()
+        probe.validate(FakeContext())
+
+        if subscribed:
+            # Simulate a console
+            probe._bind_handler(None, None, FakeReference(
+                {pelix.services.PROP_EVENT_TOPICS: ["pelix/framework/*"]}))
+
+        print("{0:12s} bundle events: {1:6.2f} us/event - "
+              "service events: {2:6.2f} us/event - posted: {3}"
+              .format("subscribed" if subscribed else "unsubscribed",
+                      run(bundle_events, probe.bundle_changed),
+                      run(service_events, probe.service_changed),
+                      probe._event.posted))
+
+
+if __name__ == "__main__":
+    main()
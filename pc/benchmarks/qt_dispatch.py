@@ -0,0 +1,268 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+QtLoader dispatch stress benchmark
+
+Starts N producer threads calling run_on_ui() in a loop and reports the
+latency of those calls (p50/p99), using the former dispatch implementation
+(processEvents() from the caller thread, one signal per call) and the current
+one.
+
+Two scenarios are run:
+
+* "cross": the UI methods do nothing. Both implementations wait for a queued
+  signal: the current one isn't expected to be faster.
+* "nested": each UI method calls run_on_ui() again, from the UI thread, as
+  the UI-building code of the components does. The former implementation
+  spins processEvents() at each nested call, which also executes the calls
+  queued by the other threads, while the current one calls the method
+  directly. With more than one producer thread, the former implementation
+  can dead-lock: the UI thread waits for a nested call which has been
+  dequeued by another call. The benchmark then reports it and exits.
+
+Usage (from the ``pc`` folder)::
+
+    python -m benchmarks.qt_dispatch -t 8 -c 2000 -n 10
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Run without a display
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+# Local package
+from benchmarks import percentile
+import core.qt
+
+# PyQt5
+import PyQt5.QtCore as QtCore
+import PyQt5.QtWidgets as QtWidgets
+
+# Standard library
+import argparse
+import sys
+import threading
+import time
+
+if sys.version_info[0] < 3:
+    import Queue as queue
+
+else:
+    import queue
+
+# ------------------------------------------------------------------------------
+
+class LegacyQtLoader(QtCore.QObject):
+    """
+    Copy of the former QtLoader dispatch: one signal per call, processEvents()
+    called from the caller thread, which waits on a threading.Event
+    """
+    __ui_queued = QtCore.pyqtSignal()
+
+    def __init__(self):
+        """
+        Sets up members
+        """
+        QtCore.QObject.__init__(self)
+        self.__app = None
+        self.__waiting_calls = None
+
+
+    def __ui_runner(self):
+        """
+        Method called by Qt in the UI thread
+        """
+        method, args, kwargs, event = self.__waiting_calls.get()
+        try:
+            method(*args, **kwargs)
+
+        finally:
+            event.set()
+            self.__waiting_calls.task_done()
+
+
+    def run_on_ui(self, method, *args, **kwargs):
+        """
+        Runs the given method in the UI thread
+        """
+        event = threading.Event()
+        self.__waiting_calls.put((method, args, kwargs, event))
+        self.__ui_queued.emit()
+        self.__app.processEvents()
+        event.wait()
+
+
+    def setup(self, argv=None):
+        """
+        Sets up the QtApplication
+        """
+        self.__waiting_calls = queue.Queue()
+        self.__app = QtWidgets.QApplication.instance() \
+            or QtWidgets.QApplication(argv or sys.argv)
+        self.__ui_queued.connect(self.__ui_runner)
+        return self.__app
+
+
+    def loop(self):
+        """
+        Blocking event loop
+        """
+        self.__app.exec_()
+
+# ------------------------------------------------------------------------------
+
+def run_producers(qt_loader, app, nb_threads, nb_calls, nb_nested=0,
+                  timeout=30, name=None):
+    """
+    Runs the producer threads and the Qt loop until all calls have been done
+
+    :param qt_loader: The loader to stress
+    :param app: The QApplication object
+    :param nb_threads: Number of producer threads
+    :param nb_calls: Number of calls per producer thread
+    :param nb_nested: Number of run_on_ui() calls made by each UI method,
+                      from the UI thread
+    :param timeout: Maximum duration of the run, in seconds: the process
+                    exits if the producers are still blocked after it
+    :param name: Name of the run, printed if it blocks
+    :return: A tuple: (sorted latencies in seconds, total duration)
+    """
+    latencies = []
+    lock = threading.Lock()
+
+    def leaf_method(value):
+        """
+        Trivial UI method
+        """
+        return value
+
+    def ui_method(value):
+        """
+        UI method, making the nested calls
+        """
+        for _ in range(nb_nested):
+            qt_loader.run_on_ui(leaf_method, value)
+
+        return value
+
+    def producer():
+        """
+        Calls run_on_ui() in a loop
+        """
+        local_latencies = []
+        for i in range(nb_calls):
+            start = time.time()
+            qt_loader.run_on_ui(ui_method, i)
+            local_latencies.append(time.time() - start)
+
+        with lock:
+            latencies.extend(local_latencies)
+
+    def coordinator():
+        """
+        Waits for the producers then stops the Qt loop
+        """
+        threads = [threading.Thread(target=producer)
+                   for _ in range(nb_threads)]
+        for thread in threads:
+            thread.start()
+
+        deadline = time.time() + timeout
+        for thread in threads:
+            thread.join(max(deadline - time.time(), 0))
+
+        if any(thread.is_alive() for thread in threads):
+            # The UI thread is blocked: its loop can't be stopped
+            print("{0} blocked after {1}s (dead-lock)".format(name, timeout))
+            sys.stdout.flush()
+            os._exit(1)
+
+        # Stop the loop from the UI thread
+        QtCore.QMetaObject.invokeMethod(app, "quit", QtCore.Qt.QueuedConnection)
+
+    start = time.time()
+    thread = threading.Thread(target=coordinator)
+    thread.start()
+    qt_loader.loop()
+    duration = time.time() - start
+    thread.join()
+
+    latencies.sort()
+    return latencies, duration
+
+
+def report(name, scenario, latencies, duration):
+    """
+    Prints the results of a run
+    """
+    print("{0:8s} {1:7s} calls={2:7d} total={3:7.3f}s rate={4:9.1f}/s "
+          "p50={5:8.3f}ms p99={6:8.3f}ms max={7:8.3f}ms"
+          .format(name, scenario, len(latencies), duration,
+                  len(latencies) / duration,
+                  percentile(latencies, .5) * 1000,
+                  percentile(latencies, .99) * 1000,
+                  latencies[-1] * 1000))
+    sys.stdout.flush()
+
+# ------------------------------------------------------------------------------
+
+def main(args=None):
+    """
+    Runs the benchmark
+    """
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="QtLoader dispatch benchmark")
+    parser.add_argument("-t", "--threads", type=int, default=8,
+                        help="Number of producer threads")
+    parser.add_argument("-c", "--calls", type=int, default=1000,
+                        help="Number of calls per producer thread")
+    parser.add_argument("-n", "--nested", type=int, default=10,
+                        help="Number of nested calls of the nested scenario")
+    parser.add_argument("--timeout", type=float, default=30,
+                        help="Maximum duration of a run (in seconds)")
+    parser.add_argument("-m", "--mode", default="both",
+                        choices=("legacy", "current", "both"),
+                        help="Dispatch implementation(s) to stress")
+    options = parser.parse_args(args)
+
+    scenarios = (("cross", 0), ("nested", options.nested))
+
+    # QtLoader creates its own QApplication: run it first
+    if options.mode in ("current", "both"):
+        qt_loader = core.qt.QtLoader()
+        app = qt_loader.setup()
+        for scenario, nb_nested in scenarios:
+            report("current", scenario,
+                   *run_producers(qt_loader, app, options.threads,
+                                  options.calls, nb_nested, options.timeout,
+                                  "current " + scenario))
+        qt_loader.stop()
+
+    if options.mode in ("legacy", "both"):
+        legacy = LegacyQtLoader()
+        app = legacy.setup()
+        for scenario, nb_nested in scenarios:
+            report("legacy", scenario,
+                   *run_producers(legacy, app, options.threads,
+                                  options.calls, nb_nested, options.timeout,
+                                  "legacy " + scenario))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Console startup benchmark
+
+Starts the console with main.run_console(), N times, each one in a new
+process, and reports the time from the process start until the main window is
+shown and until the details of the first framework are populated (a table of
+the details pane has rows).
+
+A child process prints its result as soon as it is known, then stops the
+console: it is killed if it doesn't exit within the timeout.
+
+Usage (from the ``pc`` folder)::
+
+    python -m benchmarks.startup -n 10
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Process start, as close as possible to the interpreter start
+import time
+START = time.time()
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Run without a display
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+# Local package
+from benchmarks import percentile
+
+# Standard library
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+
+# ------------------------------------------------------------------------------
+
+POLL_INTERVAL = 5
+""" Interval between two checks of the UI state (in ms) """
+
+# ------------------------------------------------------------------------------
+
+def run_console(http_port, timeout):
+    """
+    Starts the console, waits for its first framework details to be
+    populated, then stops it. Executed in a child process.
+
+    :param http_port: Port of the HTTP server
+    :param timeout: Maximum time to wait (in seconds)
+    :return: A dictionary with the "shown" and "populated" times (in
+             seconds since the process start, None if not reached), printed
+             as JSON before stopping the console
+    """
+    import main as console
+
+    # Check the UI state from the UI thread
+    import PyQt5.QtCore as QtCore
+    import PyQt5.QtWidgets as QtWidgets
+
+    times = {"shown": None, "populated": None}
+    timer = QtCore.QTimer()
+
+    def stop(framework):
+        """
+        Prints the result, then stops the framework, which stops the Qt loop
+        """
+        timer.stop()
+        print(json.dumps(times))
+        sys.stdout.flush()
+        threading.Thread(target=framework.stop).start()
+
+    def check(framework):
+        """
+        Looks for the main window and for a populated details table
+        """
+        if time.time() - START > timeout:
+            stop(framework)
+            return
+
+        for window in QtWidgets.QApplication.topLevelWidgets():
+            if not isinstance(window, QtWidgets.QMainWindow) \
+                    or not window.isVisible():
+                continue
+
+            if times["shown"] is None:
+                times["shown"] = time.time() - START
+
+            for stack in window.findChildren(QtWidgets.QStackedWidget):
+                for table in stack.findChildren(QtWidgets.QTableView):
+                    if table.model() is not None \
+                            and table.model().rowCount() > 0:
+                        times["populated"] = time.time() - START
+                        stop(framework)
+                        return
+
+    def on_ready(framework):
+        """
+        Starts checking the UI state, once the Qt loop runs
+        """
+        timer.setInterval(POLL_INTERVAL)
+        timer.timeout.connect(lambda: check(framework))
+        timer.start()
+
+    console.run_console(http_port, on_ready=on_ready)
+    return times
+
+
+def report(name, values):
+    """
+    Prints the statistics of a measure
+    """
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        print("{0:10s} never reached".format(name))
+        return
+
+    print("{0:10s} runs={1:3d} min={2:8.3f}s p50={3:8.3f}s max={4:8.3f}s"
+          .format(name, len(values), values[0], percentile(values, .5),
+                  values[-1]))
+
+# ------------------------------------------------------------------------------
+
+def main(args=None):
+    """
+    Runs the benchmark
+    """
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="Console startup benchmark")
+    parser.add_argument("-n", "--runs", type=int, default=5,
+                        help="Number of console starts")
+    parser.add_argument("-p", "--port", type=int, dest="http_port",
+                        default=8080, metavar="PORT",
+                        help="Port of the HTTP server")
+    parser.add_argument("-t", "--timeout", type=float, default=30,
+                        help="Maximum time to wait for a console (seconds)")
+    parser.add_argument("--child", action="store_true",
+                        help=argparse.SUPPRESS)
+    options = parser.parse_args(args)
+
+    if options.child:
+        # Single run, in this process
+        run_console(options.http_port, options.timeout)
+        return
+
+    results = []
+    for _ in range(options.runs):
+        with tempfile.TemporaryFile() as output:
+            # Keep the standard input open: the shell console stops the
+            # framework when it is closed
+            child = subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.startup", "--child",
+                 "-p", str(options.http_port), "-t", str(options.timeout)],
+                stdin=subprocess.PIPE, stdout=output,
+                cwd=os.path.dirname(os.path.dirname(
+                    os.path.abspath(__file__))))
+            try:
+                child.wait(options.timeout * 2)
+
+            except subprocess.TimeoutExpired:
+                # Result printed but the console didn't stop
+                child.kill()
+                child.wait()
+
+            child.stdin.close()
+
+            # The result is a JSON object among the console outputs, maybe
+            # after the shell prompt
+            output.seek(0)
+            result = {"shown": None, "populated": None}
+            for line in output.read().decode().splitlines():
+                if '{"shown"' in line:
+                    result = json.loads(line[line.index('{"shown"'):])
+
+        results.append(result)
+
+    report("shown", [result["shown"] for result in results])
+    report("populated", [result["populated"] for result in results])
+
+
+if __name__ == "__main__":
+    main()
@@ -33,6 +33,24 @@ PROP_PROBE_UID = "core.probe.uid"
 SVC_QT_LOADER = "core.qt.loader"
 """ Specification of the Qt loader service """
 
+LANE_INTERACTIVE = 0
+""" Qt loader lane of the calls building the UI or answering the user """
+
+LANE_TELEMETRY = 1
+""" Qt loader lane of live values updates (e.g. the compass angle) """
+
+LANE_BULK = 2
+""" Qt loader lane of large or numerous updates (e.g. tables content) """
+
+LANES_NAMES = ("interactive", "telemetry", "bulk")
+""" Names of the Qt loader lanes, indexed by priority """
+
+SVC_QT_STATS = "core.qt.stats"
+""" Specification of the statistics of the calls made in the UI thread """
+
+SVC_ASYNCIO_LOADER = "core.asyncio.loader"
+""" Specification of the asyncio loader service (--asyncio mode only) """
+
 QT_MAIN_FRAME = "core.qt.frame.main"
 """ Specification of the main frame """
 
@@ -48,4 +66,10 @@ SVC_DETAILS_CREATOR_FACTORY = "core.framework.details.factory"
 SVC_DETAILS = "core.framework.details"
 """ Framework details component """
 
+SVC_DETAILS_ACTIVATOR = "core.framework.details.activator"
+""" Creates the details components of a framework when it is shown """
+
+SVC_DETAILS_EXECUTOR = "core.framework.details.executor"
+""" Executes the background tasks of the details components """
+
 # ------------------------------------------------------------------------------
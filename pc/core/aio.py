@@ -0,0 +1,183 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Defines the AsyncioLoader utility class, which runs an asyncio event loop
+next to the Qt one.
+
+Coroutines executed in this loop can wait for the UI thread using
+``await qt_loader.run(method, ...)`` and run blocking calls (like remote probe
+calls) concurrently using ``await asyncio_loader.call(method, ...)``.
+
+Threads which don't use coroutines can run a set of blocking calls
+concurrently with ``asyncio_loader.call_all(methods)``: the main frame uses it
+to update the summaries of all the frameworks at once.
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Standard library
+import asyncio
+import functools
+import logging
+import threading
+
+# ------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+
+class AsyncioLoader(object):
+    """
+    Runs an asyncio event loop in a dedicated thread.
+
+    setup() and stop() should be called in the same thread as the QtLoader
+    ones.
+    """
+    def __init__(self, max_workers=None):
+        """
+        Sets up members
+
+        :param max_workers: Maximum number of threads executing blocking calls
+                            (None for the asyncio default)
+        """
+        self.__loop = None
+        self.__thread = None
+        self.__max_workers = max_workers
+
+
+    def __run_loop(self, loop, ready):
+        """
+        Event loop thread
+        """
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+
+        finally:
+            loop.close()
+
+
+    def get_loop(self):
+        """
+        Retrieves the asyncio event loop
+        """
+        return self.__loop
+
+
+    def is_loop_thread(self):
+        """
+        Checks if the current thread is the event loop one
+
+        :return: True if the caller is running in the event loop thread
+        """
+        return threading.current_thread() is self.__thread
+
+
+    def run_coroutine(self, coroutine):
+        """
+        Schedules the given coroutine in the event loop. Can be called from any
+        thread.
+
+        :param coroutine: A coroutine object
+        :return: A concurrent.futures.Future object
+        :raise ValueError: The loop hasn't been set up
+        """
+        if self.__loop is None:
+            raise ValueError("Event loop not yet set up")
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self.__loop)
+
+
+    def call(self, method, *args, **kwargs):
+        """
+        Executes a blocking method in the executor of the event loop.
+        Must be awaited from a coroutine running in the event loop, e.g.::
+
+            bundles, services = await asyncio.gather(
+                loader.call(probe.get_bundles),
+                loader.call(probe.get_services_info))
+
+        :return: An asyncio future
+        """
+        return self.__loop.run_in_executor(
+            None, functools.partial(method, *args, **kwargs))
+
+
+    def call_all(self, methods):
+        """
+        Executes the given blocking methods concurrently, in the executor of
+        the event loop. Can be called from any thread.
+
+        :param methods: An iterable of methods without argument
+        :return: A concurrent.futures.Future object, whose result is the list
+                 of the results of the methods, or of the exceptions they
+                 raised
+        :raise ValueError: The loop hasn't been set up
+        """
+        return self.run_coroutine(self.__gather(list(methods)))
+
+
+    async def __gather(self, methods):
+        """
+        Coroutine waiting for the given methods, executed concurrently
+
+        :param methods: A list of methods without argument
+        :return: The list of results or exceptions
+        """
+        return await asyncio.gather(*(self.call(method) for method in methods),
+                                    return_exceptions=True)
+
+
+    def setup(self):
+        """
+        Creates the event loop and starts its thread
+        """
+        if self.__loop is None:
+            loop = asyncio.new_event_loop()
+            if self.__max_workers:
+                # Use a custom executor size
+                import concurrent.futures
+                loop.set_default_executor(
+                    concurrent.futures.ThreadPoolExecutor(self.__max_workers))
+
+            ready = threading.Event()
+            self.__thread = threading.Thread(target=self.__run_loop,
+                                             args=(loop, ready),
+                                             name="asyncio-loop")
+            self.__thread.daemon = True
+            self.__thread.start()
+
+            # Wait for the loop to run
+            ready.wait()
+            self.__loop = loop
+
+        return self.__loop
+
+
+    def stop(self):
+        """
+        Stops the event loop and waits for its thread
+        """
+        if self.__loop is not None:
+            loop = self.__loop
+            self.__loop = None
+
+            # Stop the loop from its own thread
+            loop.call_soon_threadsafe(loop.stop)
+            self.__thread.join(1)
+            self.__thread = None
@@ -21,15 +21,18 @@ __docformat__ = "restructuredtext en"
 
 # Local package
 import core
+import core.executor
 
 # iPOPO
 from pelix.ipopo.decorators import ComponentFactory, Requires, Validate, \
-    Invalidate, Instantiate, BindField, UnbindField
+    Invalidate, Instantiate, BindField, UnbindField, Property, Provides
 import pelix.remote
 
 # Standard library
+import collections
 import logging
 import threading
+import time
 
 # ------------------------------------------------------------------------------
 
@@ -40,10 +43,23 @@ _logger = logging.getLogger(__name__)
 @ComponentFactory("probe-info-bridge-factory")
 @Requires('_creator', core.SVC_FRAMEWORK_INSTANCE_INFO_FACTORY)
 @Requires('_probes', core.SVC_PROBE, aggregate=True)
+@Property('_grace_period', 'probe.grace.period', 10.0)
+@Property('_flap_threshold', 'probe.flap.threshold', 3)
+@Property('_max_holddown', 'probe.holddown.max', 300.0)
 @Instantiate('probe-info-bridge')
 class ProbeBridge(object):
     """
     Creates a Framework Instance Info component for each probe found
+
+    Flapping probes (unbound then bound again) are damped:
+
+    * the component of a framework is only deleted once its probe has been
+      gone for the grace period: if the probe comes back before, the
+      component and its details are kept, and resynchronize themselves;
+    * after flap.threshold flaps, the creation of the component of a
+      framework which probe comes back is delayed by a hold-down time,
+      doubling at each new flap, up to probe.holddown.max seconds. The flaps
+      count is reset after probe.holddown.max seconds without flap.
     """
     def __init__(self):
         """
@@ -58,6 +74,114 @@ class ProbeBridge(object):
         # Framework UIDs -> probe service
         self._frameworks = {}
 
+        # Damping configuration
+        self._grace_period = 10.0
+        self._flap_threshold = 3
+        self._max_holddown = 300.0
+
+        # UIDs of the frameworks with a component
+        self._created = set()
+
+        # Framework UID -> pending creation or deletion timer
+        self._timers = {}
+
+        # Framework UID -> (number of flaps, time of the last flap)
+        self._flaps = {}
+
+        # Validation flag
+        self._validated = False
+        self._lock = threading.RLock()
+
+
+    def __make(self, framework_uid):
+        """
+        Creates the component of a framework, if its probe is still there.
+        Must be called with the lock held.
+
+        :param framework_uid: A framework UID
+        """
+        if framework_uid in self._frameworks and self._creator is not None:
+            self._creator.make(framework_uid)
+            self._created.add(framework_uid)
+
+
+    def __delete(self, framework_uid):
+        """
+        Deletes the component of a framework, if its probe is still gone.
+        Must be called with the lock held.
+
+        :param framework_uid: A framework UID
+        """
+        if framework_uid not in self._frameworks \
+                and framework_uid in self._created:
+            self._created.discard(framework_uid)
+            if self._creator is not None:
+                self._creator.delete(framework_uid)
+
+
+    def __start_timer(self, framework_uid, delay, method):
+        """
+        Calls the given method with the framework UID after a delay, replacing
+        the pending timer of the framework. Must be called with the lock held.
+
+        :param framework_uid: A framework UID
+        :param delay: Delay before the call (in seconds)
+        :param method: Method to call with the lock held
+        """
+        self.__cancel_timer(framework_uid)
+
+        def on_timer():
+            with self._lock:
+                if self._timers.get(framework_uid) is timer:
+                    del self._timers[framework_uid]
+                    try:
+                        method(framework_uid)
+                    except Exception as ex:
+                        _logger.error("%s: %s", type(ex).__name__, ex)
+
+        timer = threading.Timer(delay, on_timer)
+        timer.daemon = True
+        self._timers[framework_uid] = timer
+        timer.start()
+
+
+    def __cancel_timer(self, framework_uid):
+        """
+        Cancels the pending timer of a framework. Must be called with the
+        lock held.
+
+        :param framework_uid: A framework UID
+        :return: True if a timer was pending
+        """
+        timer = self._timers.pop(framework_uid, None)
+        if timer is not None:
+            timer.cancel()
+            return True
+
+        return False
+
+
+    def __get_holddown(self, framework_uid):
+        """
+        Computes the delay before creating the component of a framework,
+        according to its flaps. Must be called with the lock held.
+
+        :param framework_uid: A framework UID
+        :return: A delay in seconds (0 if the framework doesn't flap)
+        """
+        count, last_flap = self._flaps.get(framework_uid, (0, 0))
+        if time.time() - last_flap > self._max_holddown:
+            # Stable since a long time
+            self._flaps.pop(framework_uid, None)
+            return 0
+
+        excess = count - int(self._flap_threshold)
+        if excess < 0:
+            return 0
+
+        return min(float(self._grace_period) * (2 ** excess),
+                   float(self._max_holddown))
+
 
     @BindField('_probes')
     def bind_probe(self, field, service, reference):
@@ -66,12 +190,26 @@ class ProbeBridge(object):
         """
         framework_uid = reference.get_property(pelix.remote.PROP_ENDPOINT_FRAMEWORK_UUID)
 
-        # Store, using the framework UID
-        self._frameworks[framework_uid] = service
+        with self._lock:
+            # Store, using the framework UID
+            self._frameworks[framework_uid] = service
 
-        if self._creator:
-            # Create the associated component
-            self._creator.make(framework_uid)
+            if self.__cancel_timer(framework_uid) \
+                    and framework_uid in self._created:
+                # Back during its grace period: keep its component
+                _logger.debug("Framework %s is back", framework_uid)
+                return
+
+            if self._validated:
+                # Create the associated component
+                delay = self.__get_holddown(framework_uid)
+                if delay:
+                    _logger.info("Framework %s flaps: holding it down "
+                                 "for %.1fs", framework_uid, delay)
+                    self.__start_timer(framework_uid, delay, self.__make)
+
+                else:
+                    self.__make(framework_uid)
 
 
     @UnbindField('_probes')
@@ -81,13 +219,33 @@ class ProbeBridge(object):
         """
         framework_uid = reference.get_property(pelix.remote.PROP_ENDPOINT_FRAMEWORK_UUID)
 
-        if framework_uid in self._frameworks:
+        with self._lock:
+            if self._frameworks.get(framework_uid) is not service:
+                # Unknown or replaced probe
+                return
+
             # Remove it from the local storage
             del self._frameworks[framework_uid]
 
-            if self._creator:
-                # Delete the component if possible
-                self._creator.delete(framework_uid)
+            # Count the flap
+            count, last_flap = self._flaps.get(framework_uid, (0, 0))
+            now = time.time()
+            if now - last_flap > self._max_holddown:
+                count = 0
+            self._flaps[framework_uid] = (count + 1, now)
+
+            # Cancel a pending creation
+            self.__cancel_timer(framework_uid)
+
+            if framework_uid in self._created:
+                if self._validated and self._grace_period > 0:
+                    # Delete the component if the probe doesn't come back
+                    self.__start_timer(framework_uid,
+                                       float(self._grace_period),
+                                       self.__delete)
+
+                else:
+                    self.__delete(framework_uid)
 
 
     @Validate
@@ -95,9 +253,11 @@ class ProbeBridge(object):
         """
         Component validated
         """
-        for framework_uid in self._frameworks:
-            # Make a component for all already known frameworks
-            self._creator.make(framework_uid)
+        with self._lock:
+            self._validated = True
+            for framework_uid in self._frameworks:
+                # Make a component for all already known frameworks
+                self.__make(framework_uid)
 
 
     @Invalidate
@@ -105,9 +265,17 @@ class ProbeBridge(object):
         """
         Component invalidated
         """
-        for framework_uid in self._frameworks:
-            # Delete all created components
-            self._creator.delete(framework_uid)
+        with self._lock:
+            self._validated = False
+            for framework_uid in list(self._timers):
+                self.__cancel_timer(framework_uid)
+
+            for framework_uid in list(self._created):
+                # Delete all created components
+                self._creator.delete(framework_uid)
+
+            self._created.clear()
+            self._flaps.clear()
 
 # ------------------------------------------------------------------------------
 
@@ -115,10 +283,26 @@ class ProbeBridge(object):
 @Requires('_creators', core.SVC_DETAILS_CREATOR_FACTORY,
           aggregate=True)
 @Requires('_fwinfos', core.SVC_FRAMEWORK_INSTANCE_INFO, aggregate=True)
+@Provides((core.SVC_DETAILS_ACTIVATOR, core.SVC_DETAILS_EXECUTOR))
+@Property('_max_workers', 'details.workers', 8)
+@Property('_lazy', 'details.lazy', True)
+@Property('_max_active', 'details.active.max', 5)
 @Instantiate('probe-details-bridge')
 class DetailsBridge(object):
     """
-    Creates a Framework Instance Info component for each probe found
+    Creates the details components of each framework information component.
+
+    Components are created and deleted by a pool of worker threads: the
+    calls for different frameworks and different creators are concurrent,
+    while the calls for a (framework, creator) pair are done in order.
+
+    The details components use the same pool for their own background tasks,
+    through the submit() method.
+
+    In lazy mode (details.lazy), the details components of a framework are
+    only created when the UI activates it, i.e. when its tab is shown. Only
+    the details.active.max most recently activated frameworks keep their
+    details components: those of the others are deleted.
     """
     def __init__(self):
         """
@@ -133,11 +317,63 @@ class DetailsBridge(object):
         # Framework info -> [details]
         self._details = {}
 
+        # Details creation workers
+        self._max_workers = 8
+        self._executor = None
+
+        # Lazy creation: UIDs of the active frameworks, least recently
+        # activated first
+        self._lazy = True
+        self._max_active = 5
+        self._active = collections.OrderedDict()
+
         # Lock control
         self.__lock = threading.Lock()
         self.__validated = threading.Event()
 
 
+    def __submit(self, creator, uid, method):
+        """
+        Calls a creator method for the given framework, in a worker thread.
+        The calls for a framework and a creator are done in order.
+
+        :param creator: A detail component creator
+        :param uid: A framework information component UID
+        :param method: The creator method to call with the UID
+        """
+        executor = self._executor
+        if executor is not None:
+            try:
+                executor.submit((uid, creator), method, uid)
+                return
+
+            except ValueError:
+                # Executor stopped: call it directly
+                pass
+
+        try:
+            method(uid)
+        except Exception as ex:
+            _logger.error("%s: %s", type(ex).__name__, ex)
+
+
+    def submit(self, key, method, *args):
+        """
+        Calls a method in a worker thread. The calls with the same key are
+        done in order.
+
+        :param key: The ordering key of the call
+        :param method: Method to call
+        :param args: Arguments of the method
+        :raise ValueError: The workers have been stopped
+        """
+        executor = self._executor
+        if executor is None:
+            raise ValueError("Details workers are stopped")
+
+        executor.submit(key, method, *args)
+
+
     def __populate_info(self, info):
         """
         Creates the details components to be associated with the given framework
@@ -146,11 +382,9 @@ class DetailsBridge(object):
         :param info: The framework information component
         """
         uid = info.get_uid()
-        for creator in self._creators:
-            try:
-                creator.make(uid)
-            except Exception as ex:
-                _logger.error("%s: %s", type(ex).__name__, ex)
+        if self.__is_active(uid):
+            for creator in self._creators:
+                self.__submit(creator, uid, creator.make)
 
 
     def __clear_info(self, info):
@@ -160,16 +394,68 @@ class DetailsBridge(object):
         
         :param info: The framework information component
         """
+        self.__clear_uid(info.get_uid())
+
+
+    def __clear_uid(self, uid):
+        """
+        Deletes the details components associated to a framework
+
+        :param uid: A framework information component UID
+        """
+        self._active.pop(uid, None)
         if not self._creators:
             # No more creators
             return
 
-        uid = info.get_uid()
         for creator in self._creators:
-            try:
-                creator.delete(uid)
-            except Exception as ex:
-                _logger.error("%s: %s", type(ex).__name__, ex)
+            self.__submit(creator, uid, creator.delete)
+
+
+    def __is_active(self, uid):
+        """
+        Checks if the details components of a framework must exist
+
+        :param uid: A framework information component UID
+        :return: True if the framework is active or if not in lazy mode
+        """
+        return not self._lazy or uid in self._active
+
+
+    def activate(self, uid):
+        """
+        Notifies that the given framework is shown: creates its details
+        components if necessary, and deletes those of the least recently
+        activated frameworks, beyond the maximum count.
+
+        Doesn't wait for the components to be created: can be called from the
+        UI thread.
+
+        :param uid: A framework information component UID
+        """
+        with self.__lock:
+            if not self._lazy:
+                # Nothing to do
+                return
+
+            if uid in self._active:
+                # Most recently activated
+                self._active[uid] = self._active.pop(uid)
+                return
+
+            self._active[uid] = True
+            if self.__validated.is_set():
+                # Create its details (done on validation otherwise)
+                for info in self._fwinfos or ():
+                    if info.get_uid() == uid:
+                        self.__populate_info(info)
+                        break
+
+            # Deactivate the least recently activated frameworks
+            while len(self._active) > max(int(self._max_active), 1):
+                old_uid = next(iter(self._active))
+                _logger.debug("Deactivating framework %s", old_uid)
+                self.__clear_uid(old_uid)
 
 
     def __create_detail(self, creator):
@@ -180,10 +466,9 @@ class DetailsBridge(object):
         :param creator: A detail component creator
         """
         for info in self._fwinfos:
-            try:
-                creator.make(info.get_uid())
-            except Exception as ex:
-                _logger.error("%s: %s", type(ex).__name__, ex)
+            uid = info.get_uid()
+            if self.__is_active(uid):
+                self.__submit(creator, uid, creator.make)
 
 
     def __delete_detail(self, creator):
@@ -198,10 +483,7 @@ class DetailsBridge(object):
             return
 
         for info in self._fwinfos:
-            try:
-                creator.delete(info.get_uid())
-            except Exception as ex:
-                _logger.error("%s: %s", type(ex).__name__, ex)
+            self.__submit(creator, info.get_uid(), creator.delete)
 
 
     @BindField('_creators')
@@ -251,6 +533,10 @@ class DetailsBridge(object):
         """
         Component validated
         """
+        # Start the workers
+        self._executor = core.executor.KeyedExecutor(int(self._max_workers),
+                                                     "details-bridge")
+
         # Setup all known components
         for info in self._fwinfos:
             self.__populate_info(info)
@@ -267,6 +553,12 @@ class DetailsBridge(object):
         # Stop un/bindings
         self.__validated.clear()
 
-        # Clear all known components
+        # Stop the workers without waiting for them: they can be blocked by
+        # iPOPO, which is busy with this invalidation
+        executor = self._executor
+        self._executor = None
+        executor.shutdown(False)
+
+        # Clear all known components, from this thread
         for info in self._fwinfos:
             self.__clear_info(info)
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Defines a thread pool executing tasks concurrently, except for tasks sharing
+the same key, which are executed in submission order.
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Standard library
+import collections
+import logging
+import threading
+
+# Python 3.2+, or the "futures" back-port, which provides the same package
+from concurrent.futures import ThreadPoolExecutor
+
+# ------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+
+class KeyedExecutor(object):
+    """
+    Bounded thread pool, with per-key ordering: tasks with the same key are
+    executed one at a time, in submission order, while tasks with different
+    keys are executed concurrently.
+
+    A worker thread handles all the waiting tasks of a key before handling
+    another key.
+    """
+    def __init__(self, max_workers=8, name="keyed-executor"):
+        """
+        Sets up members
+
+        :param max_workers: Maximum number of worker threads
+        :param name: Name of the executor, used in logs
+        """
+        self.__name = name
+        self.__pool = ThreadPoolExecutor(max_workers)
+        self.__lock = threading.Lock()
+
+        # Key -> deque of waiting (method, args, kwargs) tuples, the first
+        # one being executed
+        self.__queues = {}
+
+        # Shutdown flag
+        self.__closed = False
+
+
+    def submit(self, key, method, *args, **kwargs):
+        """
+        Submits a task
+
+        :param key: The ordering key of the task
+        :param method: Method to call
+        :raise ValueError: The executor has been shut down
+        """
+        with self.__lock:
+            if self.__closed:
+                raise ValueError("{0} has been shut down".format(self.__name))
+
+            try:
+                # Tasks are already being executed for this key
+                self.__queues[key].append((method, args, kwargs))
+
+            except KeyError:
+                # Let a worker handle this key
+                self.__queues[key] = collections.deque(((method, args,
+                                                         kwargs),))
+                self.__pool.submit(self.__drain, key)
+
+
+    def __drain(self, key):
+        """
+        Executes the tasks waiting for the given key, until there is none
+
+        :param key: An ordering key
+        """
+        with self.__lock:
+            queue = self.__queues[key]
+
+        while True:
+            method, args, kwargs = queue[0]
+            try:
+                method(*args, **kwargs)
+
+            except Exception as ex:
+                _logger.exception("%s: error executing task for %s: %s",
+                                  self.__name, key, ex)
+
+            with self.__lock:
+                queue.popleft()
+                if not queue:
+                    # Done with this key
+                    del self.__queues[key]
+                    return
+
+
+    def pending(self):
+        """
+        Returns the number of tasks waiting or being executed
+
+        :return: A number of tasks
+        """
+        with self.__lock:
+            return sum(len(queue) for queue in self.__queues.values())
+
+
+    def shutdown(self, wait=True):
+        """
+        Stops the executor. Already submitted tasks are executed.
+
+        :param wait: If True, wait for those tasks to be executed
+        """
+        with self.__lock:
+            self.__closed = True
+
+        self.__pool.shutdown(wait)
@@ -21,27 +21,43 @@ __docformat__ = "restructuredtext en"
 
 # Local package
 import core
+import core.models
+import ui.forms
 
 # PyQt5
+import PyQt5.QtCore as QtCore
 import PyQt5.QtWidgets as QtWidgets
-import PyQt5.uic as uic
 
 # iPOPO
 from pelix.ipopo.decorators import ComponentFactory, Requires, Validate, \
     Invalidate, Instantiate, Provides, BindField, UnbindField
 
 # Standard library
-import os
+import functools
+import logging
+import threading
+import time
+
+# ------------------------------------------------------------------------------
+
+REFRESH_INTERVAL = 1000
+""" Interval between two refreshes of the frameworks overview (in ms) """
+
+_logger = logging.getLogger(__name__)
 
 # ------------------------------------------------------------------------------
 
 class _QtMainFrame(QtWidgets.QMainWindow):
     """
-    Represents the UI, loaded from a UI file
+    Represents the UI, built by the compiled "main" form. The widgets of the
+    form are members of the ``ui`` attribute.
     """
-    def __init__(self, controller, ui_file):
+    def __init__(self, controller, form):
         """
         Sets up the frame
+
+        :param controller: The MainFrame component
+        :param form: The compiled form module
         """
         # Parent constructor
         QtWidgets.QMainWindow.__init__(self)
@@ -49,13 +65,14 @@ class _QtMainFrame(QtWidgets.QMainWindow):
         # Store the controller
         self.__controller = controller
 
-        # Load the frame UI
-        uic.loadUi(ui_file, self)
+        # Build the frame UI
+        self.ui = form.Ui_main()
+        self.ui.setupUi(self)
 
         # Connect to signals
-        self.action_quit.triggered.connect(controller.quit)
-        self.action_about.triggered.connect(self.__about)
-        self.action_about_qt.triggered.connect(self.__about_qt)
+        self.ui.action_quit.triggered.connect(controller.quit)
+        self.ui.action_about.triggered.connect(self.__about)
+        self.ui.action_about_qt.triggered.connect(self.__about_qt)
 
 
     def __about(self):
@@ -73,15 +90,93 @@ class _QtMainFrame(QtWidgets.QMainWindow):
 
 # ------------------------------------------------------------------------------
 
+class FrameworksModel(core.models.IndexedTableModel):
+    """
+    Frameworks overview model.
+
+    Records are the summaries returned by the get_summary() method of the
+    framework information components: (name, bundles count, services count,
+    events rate, last seen time, online flag) tuples.
+    """
+    def __init__(self, parent=None):
+        """
+        Sets up members
+
+        :param parent: Parent QObject
+        """
+        core.models.IndexedTableModel.__init__(
+            self, ('Framework', 'Bundles', 'Services', 'Events/s',
+                   'Last seen'), parent)
+
+
+    def format_cell(self, record, column):
+        """
+        Returns the text to show in a cell
+        """
+        if column in (1, 2):
+            # Counts
+            return "?" if record[column] is None else str(record[column])
+
+        elif column == 3:
+            # Events rate
+            return "{0:.1f}".format(record[3])
+
+        elif column == 4:
+            # Last seen time
+            if record[4] is None:
+                return "-"
+
+            text = time.strftime("%H:%M:%S", time.localtime(record[4]))
+            if not record[5]:
+                text += " (offline)"
+
+            return text
+
+        return record[0]
+
+
+    def sort_value(self, record, column):
+        """
+        Returns the value used to sort a column
+        """
+        value = record[column]
+        if value is None:
+            # Unknown values first
+            return -1
+
+        return value
+
+
+    def tokens(self, record):
+        """
+        Only the name of the framework is searched
+        """
+        return (record[0].lower(),)
+
+# ------------------------------------------------------------------------------
+
 @ComponentFactory("MainFrameFactory")
 @Requires("_qt_loader", core.SVC_QT_LOADER)
 @Requires('_frameworks_info', core.SVC_FRAMEWORK_INSTANCE_INFO,
           aggregate=True, optional=True)
+@Requires('_activator', core.SVC_DETAILS_ACTIVATOR, optional=True)
+@Requires('_asyncio_loader', core.SVC_ASYNCIO_LOADER, optional=True)
+@Requires('_executor', core.SVC_DETAILS_EXECUTOR, optional=True)
 @Provides(core.QT_MAIN_FRAME)
 @Instantiate("MainFrame")
 class MainFrame(object):
     """
     The main frame component
+
+    Shows an overview of the known frameworks and the details of the
+    selected one. The widget of a framework is only created when it is
+    selected for the first time.
+
+    The summaries of the frameworks are updated from their probes by a
+    poller thread, while the UI timer only shows the rows which changed.
+    The probes are called concurrently, by the asyncio loader if available
+    (--asyncio) or by the details executor. A framework is skipped while its
+    previous update is running: a slow probe only delays its own row.
     """
     def __init__(self):
         """
@@ -102,17 +197,69 @@ class MainFrame(object):
         # Frameworks
         self._frameworks_info = None
 
-        # Tabs
-        self._frameworks_tabs = {}
+        # Details activator
+        self._activator = None
+
+        # Asyncio loader (optional)
+        self._asyncio_loader = None
+
+        # Framework UID -> framework information service
+        self._infos = {}
+
+        # Framework UID -> details widget
+        self._details_widgets = {}
+
+        # UID of the framework shown in the details pane
+        self._shown_uid = None
+
+        # Overview model, view, proxy model, details pane and refresh timer
+        self._model = None
+        self._view = None
+        self._proxy = None
+        self._stack = None
+        self._timer = None
+
+        # Summaries poller thread and its stop event
+        self._poller = None
+        self._poller_stop = None
+
+        # Details executor (optional)
+        self._executor = None
+
+        # UIDs of the frameworks whose summary is being updated
+        self._polling = set()
+        self._polling_lock = threading.Lock()
 
 
     def __make_ui(self):
         """
         Sets up the frame. Must be called from the UI thread
         """
-        # Load the UI file
-        ui_path = os.path.join(os.getcwd(), "ui", "main.ui")
-        self._frame = _QtMainFrame(self, ui_path)
+        # Build the frame from the compiled form
+        self._frame = _QtMainFrame(self, ui.forms.load_form("main"))
+
+        # Overview and details pane
+        splitter = self._frame.ui.frameworks_splitter
+        self._model = FrameworksModel(self._frame)
+        self._view, self._proxy = core.models.make_sorted_view(self._model,
+                                                               splitter)
+        self._view.setSelectionMode(
+            QtWidgets.QAbstractItemView.SingleSelection)
+        self._view.selectionModel().currentRowChanged.connect(
+            self.__on_current_changed)
+        splitter.addWidget(core.models.make_search_view(self._view,
+                                                        self._proxy,
+                                                        splitter))
+
+        self._stack = QtWidgets.QStackedWidget(splitter)
+        splitter.addWidget(self._stack)
+        splitter.setStretchFactor(1, 1)
+
+        # Periodic refresh of the overview
+        self._timer = QtCore.QTimer(self._frame)
+        self._timer.setInterval(REFRESH_INTERVAL)
+        self._timer.timeout.connect(self.__refresh)
+        self._timer.start()
 
         # Show the frame
         self._frame.show()
@@ -122,9 +269,17 @@ class MainFrame(object):
         """
         Clears the UI. Must be called from the UI thread
         """
+        # Stop the refresh
+        self._timer.stop()
+        self._timer = None
+
         # Close the window
         self._frame.hide()
         self._frame = None
+        self._model = None
+        self._view = None
+        self._proxy = None
+        self._stack = None
 
 
     def get_frame(self):
@@ -141,43 +296,166 @@ class MainFrame(object):
         self._context.get_bundle(0).stop()
 
 
-    def __add_info_tab(self, framework_info):
+    def __on_current_changed(self, current, previous):
         """
-        Adds a tab representing a framework information
+        The current row of the overview changed: shows the details of its
+        framework.
+
+        To run in the UI thread.
+        """
+        if current.isValid():
+            row = self._proxy.mapToSource(current).row()
+            self.__show_details(self._model.get_key(row))
+
+
+    def __show_details(self, uid):
+        """
+        Shows the details of a framework, creating its widget if necessary
+
+        To run in the UI thread.
+
+        :param uid: A framework UID
+        """
+        framework_info = self._infos.get(uid)
+        if framework_info is None:
+            return
+
+        widget = self._details_widgets.get(uid)
+        if widget is None:
+            # First time shown
+            widget = framework_info.get_widget(self._stack)
+            self._details_widgets[uid] = widget
+            self._stack.addWidget(widget)
+
+        self._stack.setCurrentWidget(widget)
+        self._shown_uid = uid
+        self.__activate_shown()
+
+
+    def __activate_shown(self):
+        """
+        Activates the details of the currently shown framework.
+
+        To run in the UI thread.
+        """
+        activator = self._activator
+        if activator is not None and self._shown_uid in self._infos:
+            activator.activate(self._shown_uid)
+
+
+    def __poll_summaries(self, stop_event):
+        """
+        Updates the summaries of the frameworks from their probes, until the
+        stop event is set.
+
+        Runs in the poller thread.
+
+        :param stop_event: A threading Event
+        """
+        while not stop_event.wait(REFRESH_INTERVAL / 1000.):
+            calls = []
+            for framework_info in list(self._frameworks_info or ()):
+                uid = framework_info.get_uid()
+                with self._polling_lock:
+                    if uid in self._polling:
+                        # Previous update still running
+                        continue
+
+                    self._polling.add(uid)
+
+                calls.append((uid, functools.partial(self.__update_summary,
+                                                     framework_info, uid)))
+
+            loader = self._asyncio_loader
+            if loader is not None:
+                # Call all the probes at once, without waiting for them
+                try:
+                    loader.call_all(call for _, call in calls)
+                    continue
+
+                except ValueError:
+                    # Loader stopped: use the executor
+                    pass
+
+            executor = self._executor
+            for uid, call in calls:
+                if executor is not None:
+                    try:
+                        executor.submit((uid, "summary"), call)
+                        continue
+
+                    except ValueError:
+                        # Workers stopped
+                        pass
+
+                # No executor: call the probe from this thread
+                call()
+
+
+    def __update_summary(self, framework_info, uid):
+        """
+        Updates the summary of a framework from its probe
+
+        :param framework_info: A framework information component
+        :param uid: The UID of the framework
+        """
+        try:
+            framework_info.update_summary()
+
+        except Exception as ex:
+            _logger.error("Error updating the summary of %s: %s", uid, ex)
+
+        finally:
+            with self._polling_lock:
+                self._polling.discard(uid)
+
+
+    def __refresh(self):
+        """
+        Updates the overview rows whose summary changed.
+
+        To run in the UI thread.
+        """
+        for uid, framework_info in self._infos.items():
+            summary = framework_info.get_summary()
+            if summary != self._model.get_record(uid):
+                self._model.set_record(uid, summary)
+
+
+    def __add_info(self, framework_info):
+        """
+        Adds the overview row of a framework
         
         To run in the UI thread.
         """
-        # Prepare the content
-        name = framework_info.get_name()
         uid = framework_info.get_uid()
-        widget = framework_info.get_widget(self._frame)
+        self._infos[uid] = framework_info
+        self._model.set_record(uid, framework_info.get_summary())
 
-        # Add the tab
-        tab_bar = self._frame.frameworks_bar
-        tab_bar.addTab(widget, name)
+        if self._shown_uid is None:
+            # Nothing shown yet: select it
+            index = self._model.index(self._model.get_row(uid), 0)
+            self._view.setCurrentIndex(self._proxy.mapFromSource(index))
 
-        # Store its widget
-        self._frameworks_tabs[uid] = widget
 
-
-    def __remove_info_tab(self, framework_info):
+    def __remove_info(self, framework_info):
         """
-        Removes a tab representing a framework information
+        Removes the overview row and the details widget of a framework
         
         To run in the UI thread.
         """
         # Get framework ID
         uid = framework_info.get_uid()
+        self._infos.pop(uid, None)
+        self._model.remove_record(uid)
 
-        # Pop its widget
-        widget = self._frameworks_tabs.pop(uid)
+        # Remove its details widget
+        widget = self._details_widgets.pop(uid, None)
+        if widget is not None:
+            self._stack.removeWidget(widget)
 
-        # Remove the tab
-        tab_bar = self._frame.frameworks_bar
-        index = tab_bar.indexOf(widget)
-        if index > -1:
-            # Found it
-            tab_bar.removeTab(index)
+        if self._shown_uid == uid:
+            self._shown_uid = None
 
         # Clean the component
         framework_info.clean(self._frame)
@@ -189,7 +467,16 @@ class MainFrame(object):
         Framework info service bound
         """
         if self.__validated:
-            self._qt_loader.run_on_ui(self.__add_info_tab, service)
+            self._qt_loader.run_on_ui(self.__add_info, service)
+
+
+    @BindField('_activator')
+    def bind_activator(self, field, service, reference):
+        """
+        Details activator bound
+        """
+        if self.__validated:
+            self._qt_loader.run_on_ui(self.__activate_shown)
 
 
     @UnbindField('_frameworks_info')
@@ -198,7 +485,7 @@ class MainFrame(object):
         Framework info service gone
         """
         if self.__validated:
-            self._qt_loader.run_on_ui(self.__remove_info_tab, service)
+            self._qt_loader.run_on_ui(self.__remove_info, service)
 
 
     @Validate
@@ -211,14 +498,22 @@ class MainFrame(object):
         self._context = context
         self._qt_loader.run_on_ui(self.__make_ui)
 
-        # Make tabs for already known framework info
+        # Add the already known frameworks
         if self._frameworks_info:
             for service in self._frameworks_info:
-                self._qt_loader.run_on_ui(self.__add_info_tab, service)
+                self._qt_loader.run_on_ui(self.__add_info, service)
 
         # Flag to allow un/bind probes to work
         self.__validated = True
 
+        # Start polling the summaries
+        self._poller_stop = threading.Event()
+        self._poller = threading.Thread(target=self.__poll_summaries,
+                                        args=(self._poller_stop,),
+                                        name="overview-poller")
+        self._poller.daemon = True
+        self._poller.start()
+
 
     @Invalidate
     def invalidate(self, context):
@@ -230,10 +525,16 @@ class MainFrame(object):
         # De-activate binding call backs
         self.__validated = False
 
-        # Removes tabs
+        # Stop polling the summaries
+        self._poller_stop.set()
+        self._poller.join(1)
+        self._poller = None
+        self._poller_stop = None
+
+        # Remove the frameworks
         if self._frameworks_info:
             for service in self._frameworks_info:
-                self._qt_loader.run_on_ui(self.__remove_info_tab, service)
+                self._qt_loader.run_on_ui(self.__remove_info, service)
 
         # Clear the UI
         self._qt_loader.run_on_ui(self.__clear_ui)
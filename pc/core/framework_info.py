@@ -1,7 +1,8 @@
 #!/usr/bin/python
 # -- Content-Encoding: UTF-8 --
 """
-Defines the Qt tab widget containing the informations of a framework
+Defines the Qt tab widget containing the informations of a framework, and
+the summary of its state shown in the frameworks overview
 
 :author: Thomas Calmant
 :copyright: Copyright 2013, isandlaTech
@@ -28,11 +29,10 @@ from pelix.ipopo.decorators import ComponentFactory, Requires, \
 import pelix.ipopo.constants as constants
 import pelix.remote
 
-# PyQt5
-import PyQt5.QtWidgets as QtWidgets
-
 # Standard library
 import logging
+import threading
+import time
 
 # ------------------------------------------------------------------------------
 
@@ -147,7 +147,7 @@ class FrameworkInstanceInfoCreator(object):
         :param context: Bundle context
         """
         # Clear all known instances
-        for dispatcher_id in self._instances.keys():
+        for dispatcher_id in list(self._instances):
             self.delete(dispatcher_id)
 
         self._instances.clear()
@@ -156,12 +156,24 @@ class FrameworkInstanceInfoCreator(object):
 
 @ComponentFactory(FRAMEWORK_INFO_FACTORY)
 @Requires('_details', core.SVC_DETAILS, aggregate=True, optional=True)
+@Requires('_probe', core.SVC_PROBE, optional=True)
 @Requires('_qt_loader', core.SVC_QT_LOADER)
+@Requires('_executor', core.SVC_DETAILS_EXECUTOR, optional=True)
 @Provides(core.SVC_FRAMEWORK_INSTANCE_INFO)
 @Property('_dispatcher_id', core.PROP_PROBE_UID)
 class FrameworkInstanceInfo(object):
     """
     The framework instance info widget
+
+    Also keeps a summary of the state of the framework: the numbers of
+    bundles and services are loaded from the probe when it is bound, then
+    refreshed by periodic calls to update_summary(). The events rate is
+    computed from the probe revision, which is incremented at each bundle
+    or service event: this component doesn't subscribe to the framework
+    events, so that the probe only posts them when details are shown.
+
+    The summary is loaded by the details executor, which is optional as it
+    is provided by a component requiring the framework information ones.
     """
     def __init__(self):
         """
@@ -173,6 +185,24 @@ class FrameworkInstanceInfo(object):
         # The details services
         self._details = None
 
+        # The associated probe
+        self._probe = None
+
+        # Background tasks executor
+        self._executor = None
+
+        # Summary: bundles and services counts (None if unknown) and time of
+        # the last change or probe binding
+        self._summary_lock = threading.Lock()
+        self._nb_bundles = None
+        self._nb_services = None
+        self._last_seen = None
+
+        # Events rate: last computed rate, and (time, probe revision) when it
+        # was computed (revision is None while unknown)
+        self._rate = 0.
+        self._rate_base = (time.time(), None)
+
         # Details service -> reference
         self._details_refs = {}
 
@@ -200,6 +230,142 @@ class FrameworkInstanceInfo(object):
         return self._dispatcher_id
 
 
+    def get_summary(self):
+        """
+        Retrieves the summary of the state of the framework, as last updated.
+        Values are rounded as they are shown, so that successive summaries
+        can be compared.
+
+        :return: A tuple: (name, number of bundles, number of services,
+                 events per second, last seen time, online flag). Counts are
+                 None while unknown.
+        """
+        with self._summary_lock:
+            last_seen = self._last_seen
+            return (self.get_name(), self._nb_bundles, self._nb_services,
+                    round(self._rate, 1),
+                    int(last_seen) if last_seen is not None else None,
+                    self._probe is not None)
+
+
+    def update_summary(self):
+        """
+        Updates the summary of the state of the framework with a single probe
+        call. The events rate is computed over the time since the previous
+        update.
+
+        Blocking: must be called out of the UI thread.
+        """
+        probe = self._probe
+        if probe is None:
+            return
+
+        try:
+            summary = probe.get_summary()
+
+        except Exception as ex:
+            # Probe gone or older probe: keep the known values
+            _logger.debug("Error updating the summary of %s: %s",
+                          self.get_name(), ex)
+            return
+
+        now = time.time()
+        revision = summary.get('revision')
+        with self._summary_lock:
+            if self._probe is not probe:
+                # Probe changed during the call
+                return
+
+            self._nb_bundles = summary['bundles']
+            self._nb_services = summary['services']
+
+            base_time, base_revision = self._rate_base
+            if base_revision is not None and revision is not None \
+                    and revision >= base_revision and now > base_time:
+                self._rate = (revision - base_revision) / (now - base_time)
+                if revision != base_revision:
+                    self._last_seen = now
+
+            else:
+                # First update or new probe
+                self._rate = 0.
+
+            self._rate_base = (now, revision)
+
+
+    def __load_summary(self, probe):
+        """
+        Loads the numbers of bundles and services from the probe.
+
+        Runs in a details executor worker.
+
+        :param probe: The probe to request
+        """
+        try:
+            try:
+                summary = probe.get_summary()
+                nb_bundles = summary['bundles']
+                nb_services = summary['services']
+
+            except Exception as ex:
+                # Older probe
+                _logger.debug("Probe summary not available: %s", ex)
+                nb_bundles = len(probe.get_bundles())
+                nb_services = len(probe.get_services_info())
+
+        except Exception as ex:
+            _logger.error("Error loading the summary of %s: %s",
+                          self.get_name(), ex)
+            return
+
+        with self._summary_lock:
+            if self._probe is probe:
+                self._nb_bundles = nb_bundles
+                self._nb_services = nb_services
+                self._last_seen = time.time()
+
+
+    @BindField('_probe')
+    def _bind_probe(self, field, service, reference):
+        """
+        The probe has been bound
+        """
+        with self._summary_lock:
+            self._last_seen = time.time()
+            self._rate = 0.
+            self._rate_base = (time.time(), None)
+
+        self.__submit_load(service, self._executor)
+
+
+    @BindField('_executor')
+    def _bind_executor(self, field, service, reference):
+        """
+        The details executor has been bound
+        """
+        self.__submit_load(self._probe, service)
+
+
+    def __submit_load(self, probe, executor):
+        """
+        Loads the summary from the probe, in the details executor. Does
+        nothing if one of them is missing.
+
+        :param probe: The probe to request
+        :param executor: The details executor
+        """
+        if probe is None or executor is None:
+            return
+
+        try:
+            executor.submit((self._dispatcher_id, FRAMEWORK_INFO_FACTORY),
+                            self.__load_summary, probe)
+
+        except ValueError:
+            # Workers are stopped: the component is going away
+            pass
+
+
     def get_widget(self, parent):
         """
         Makes the Qt widget that will show the framework instance information.
@@ -211,6 +377,9 @@ class FrameworkInstanceInfo(object):
         if self._widget:
             return self._widget
 
+        # Import Qt only when the widget is built
+        import PyQt5.QtWidgets as QtWidgets
+
         # Make the tab bar
         self._widget = QtWidgets.QTabWidget(parent)
 
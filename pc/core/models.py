@@ -0,0 +1,395 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Defines the Qt table models used by the details components
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Local package
+import core.search
+
+# PyQt5
+import PyQt5.QtCore as QtCore
+import PyQt5.QtWidgets as QtWidgets
+
+# ------------------------------------------------------------------------------
+
+SORT_ROLE = QtCore.Qt.UserRole
+""" Role giving the raw value of a cell, to be used to sort rows """
+
+SEARCH_DELAY = 150
+""" Time to wait after the last key stroke before filtering rows (in ms) """
+
+# ------------------------------------------------------------------------------
+
+class IndexedTableModel(QtCore.QAbstractTableModel):
+    """
+    Table model whose rows are identified by a key, with a key -> row index.
+    Each row is a record, i.e. a tuple with one value per column.
+
+    Rows are stored in no particular order: sorting is left to a
+    QSortFilterProxyModel using SORT_ROLE. This allows to update, add and
+    remove rows in constant time, emitting fine-grained signals.
+
+    Must only be used from the UI thread.
+    """
+    def __init__(self, headers, parent=None):
+        """
+        Sets up members
+
+        :param headers: Columns titles
+        :param parent: Parent QObject
+        """
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self._headers = tuple(headers)
+
+        # Row -> key, row -> record and key -> row
+        self._keys = []
+        self._records = []
+        self._rows = {}
+
+        # Search index, built on first search
+        self._index = None
+
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """
+        Returns the number of rows
+        """
+        if parent.isValid():
+            # No child
+            return 0
+
+        return len(self._records)
+
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        """
+        Returns the number of columns
+        """
+        if parent.isValid():
+            # No child
+            return 0
+
+        return len(self._headers)
+
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        """
+        Returns the columns titles
+        """
+        if orientation == QtCore.Qt.Horizontal \
+                and role == QtCore.Qt.DisplayRole:
+            return self._headers[section]
+
+        return None
+
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        """
+        Returns the content of a cell
+        """
+        if not index.isValid():
+            return None
+
+        if role == QtCore.Qt.DisplayRole:
+            return self.format_cell(self._records[index.row()], index.column())
+
+        elif role == SORT_ROLE:
+            return self.sort_value(self._records[index.row()], index.column())
+
+        return None
+
+
+    def format_cell(self, record, column):
+        """
+        Returns the text to show in a cell. Can be overridden.
+
+        :param record: The record of the row
+        :param column: The column index
+        :return: The text of the cell
+        """
+        value = record[column]
+        if value is None:
+            return ""
+
+        return str(value)
+
+
+    def sort_value(self, record, column):
+        """
+        Returns the value used to sort a column. Can be overridden.
+
+        :param record: The record of the row
+        :param column: The column index
+        :return: A value comparable with those of the other rows
+        """
+        return record[column]
+
+
+    def tokens(self, record):
+        """
+        Returns the search tokens of a record. Can be overridden.
+
+        :param record: The record of a row
+        :return: An iterable of lower-case strings
+        """
+        return (str(value).lower() for value in record if value is not None)
+
+
+    def search(self, query):
+        """
+        Sets the current search query. The search index is built on the first
+        call, then maintained along with the records.
+
+        :param query: A query string (terms separated by spaces)
+        """
+        if self._index is None:
+            if not query:
+                # Nothing to do
+                return
+
+            self._index = core.search.SearchIndex()
+            for key, record in zip(self._keys, self._records):
+                self._index.set_document(key, self.tokens(record))
+
+        self._index.search(query)
+
+
+    def accepts_row(self, row):
+        """
+        Checks if the given row matches the current search query
+
+        :param row: A row number
+        :return: True if the row must be shown
+        """
+        return self._index is None or self._index.accepts(self._keys[row])
+
+
+    def get_keys(self):
+        """
+        Returns the keys of all rows (in no particular order)
+        """
+        return list(self._keys)
+
+
+    def get_record(self, key):
+        """
+        Returns the record associated to the given key
+
+        :param key: A row key
+        :return: The record, or None
+        """
+        row = self._rows.get(key)
+        if row is None:
+            return None
+
+        return self._records[row]
+
+
+    def get_row(self, key):
+        """
+        Returns the source row associated to the given key
+
+        :param key: A row key
+        :return: The row number, or None
+        """
+        return self._rows.get(key)
+
+
+    def get_key(self, row):
+        """
+        Returns the key of the given source row
+
+        :param row: A row number
+        :return: The row key
+        """
+        return self._keys[row]
+
+
+    def set_record(self, key, record):
+        """
+        Updates or adds the row associated to the given key
+
+        :param key: A row key
+        :param record: The new record of the row
+        """
+        if self._index is not None:
+            # Update the index before the proxy filters the row
+            self._index.set_document(key, self.tokens(record))
+
+        row = self._rows.get(key)
+        if row is not None:
+            # Update the existing row
+            self._records[row] = record
+            self.dataChanged.emit(self.index(row, 0),
+                                  self.index(row, len(self._headers) - 1))
+
+        else:
+            # Append a new row
+            row = len(self._records)
+            self.beginInsertRows(QtCore.QModelIndex(), row, row)
+            self._keys.append(key)
+            self._records.append(record)
+            self._rows[key] = row
+            self.endInsertRows()
+
+
+    def remove_record(self, key):
+        """
+        Removes the row associated to the given key, replacing it by the last
+        row of the model
+
+        :param key: A row key
+        :return: True if the row was found
+        """
+        row = self._rows.get(key)
+        if row is None:
+            return False
+
+        if self._index is not None:
+            self._index.remove_document(key)
+
+        last = len(self._records) - 1
+        if row != last:
+            # Move the last row in place of the removed one
+            last_key = self._keys[last]
+            self._keys[row] = last_key
+            self._records[row] = self._records[last]
+            self._rows[last_key] = row
+            self.dataChanged.emit(self.index(row, 0),
+                                  self.index(row, len(self._headers) - 1))
+
+        # Remove the last row
+        self.beginRemoveRows(QtCore.QModelIndex(), last, last)
+        del self._keys[last]
+        del self._records[last]
+        del self._rows[key]
+        self.endRemoveRows()
+        return True
+
+
+    def reset_records(self, items):
+        """
+        Replaces the whole content of the model
+
+        :param items: An iterable of (key, record) tuples
+        """
+        self.beginResetModel()
+        self._keys = []
+        self._records = []
+        self._rows = {}
+        if self._index is not None:
+            self._index.clear()
+
+        for key, record in items:
+            row = self._rows.get(key)
+            if row is not None:
+                # Duplicated key: keep the last record
+                self._records[row] = record
+
+            else:
+                self._rows[key] = len(self._records)
+                self._keys.append(key)
+                self._records.append(record)
+
+        if self._index is not None:
+            for key, record in zip(self._keys, self._records):
+                self._index.set_document(key, self.tokens(record))
+
+        self.endResetModel()
+
+# ------------------------------------------------------------------------------
+
+class SearchFilterProxyModel(QtCore.QSortFilterProxyModel):
+    """
+    Sort proxy filtering the rows of an IndexedTableModel according to its
+    search index
+    """
+    def filterAcceptsRow(self, source_row, source_parent):
+        """
+        Checks if a row of the source model must be shown
+        """
+        return self.sourceModel().accepts_row(source_row)
+
+
+    def search(self, query):
+        """
+        Filters the rows according to the given query
+
+        :param query: A query string (terms separated by spaces)
+        """
+        self.sourceModel().search(query)
+        self.invalidateFilter()
+
+# ------------------------------------------------------------------------------
+
+def make_sorted_view(model, parent, sort_column=0):
+    """
+    Makes a table view showing the given model, sorted using SORT_ROLE
+
+    :param model: An IndexedTableModel
+    :param parent: The parent widget
+    :param sort_column: The column initially used to sort rows
+    :return: A (QTableView, QSortFilterProxyModel) tuple
+    """
+    # Sort and filter through a proxy
+    proxy = SearchFilterProxyModel(parent)
+    proxy.setSourceModel(model)
+    proxy.setSortRole(SORT_ROLE)
+    proxy.setDynamicSortFilter(True)
+
+    # Make the view
+    view = QtWidgets.QTableView(parent)
+    view.setModel(proxy)
+    view.setSortingEnabled(True)
+    view.sortByColumn(sort_column, QtCore.Qt.AscendingOrder)
+    view.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+    view.verticalHeader().hide()
+    view.horizontalHeader().setStretchLastSection(True)
+    return view, proxy
+
+
+def make_search_view(view, proxy, parent):
+    """
+    Makes a widget showing a search box above the given view. The rows are
+    filtered once the user stopped typing for SEARCH_DELAY milliseconds.
+
+    :param view: A view made by make_sorted_view()
+    :param proxy: The proxy model of the view
+    :param parent: The parent widget
+    :return: The container widget
+    """
+    container = QtWidgets.QWidget(parent)
+
+    search_box = QtWidgets.QLineEdit(container)
+    search_box.setPlaceholderText("Search...")
+    search_box.setClearButtonEnabled(True)
+
+    # Filter only after the last key stroke
+    timer = QtCore.QTimer(container)
+    timer.setSingleShot(True)
+    timer.setInterval(SEARCH_DELAY)
+    timer.timeout.connect(lambda: proxy.search(search_box.text()))
+    search_box.textChanged.connect(lambda _: timer.start())
+
+    layout = QtWidgets.QVBoxLayout(container)
+    layout.setContentsMargins(0, 0, 0, 0)
+    layout.addWidget(search_box)
+    view.setParent(container)
+    layout.addWidget(view)
+    return container
@@ -24,14 +24,24 @@ import core
 
 # iPOPO
 from pelix.ipopo.decorators import ComponentFactory, Validate, \
-    Invalidate, Instantiate, Provides, Property, Requires
+    Invalidate, Instantiate, Provides, Property, Requires, BindField, \
+    UnbindField
+from pelix.utilities import is_string
 import pelix.constants
 import pelix.framework
+import pelix.ldapfilter
 import pelix.remote
 import pelix.services
 
 # Standard library
+import bisect
+import collections
+import fnmatch
+import itertools
 import logging
+import re
+import threading
+import time
 
 # ------------------------------------------------------------------------------
 
@@ -41,6 +51,38 @@ BUNDLE_EVENT_PREFIX = "pelix/framework/BundleEvent"
 SERVICE_EVENT_PREFIX = "pelix/framework/ServiceEvent"
 """ Prefix to Service events """
 
+BUNDLE_EVENTS_BATCH = "pelix/framework/BundleEvents"
+""" Topic of a batch of Bundle events """
+
+SERVICE_EVENTS_BATCH = "pelix/framework/ServiceEvents"
+""" Topic of a batch of Service events """
+
+SERVICE_ID_LOWER_BOUND = re.compile(r"^\({0}>=(\d+)\)$".format(
+    re.escape(pelix.constants.SERVICE_ID)))
+""" Filter selecting the services from a given ID, used to page services """
+
+CHANGE_ADDED = "added"
+CHANGE_MODIFIED = "modified"
+CHANGE_REMOVED = "removed"
+""" Kinds of changes returned by get_changes_since() """
+
+BUNDLE_EVENTS = (("INSTALLED", CHANGE_ADDED),
+                 ("STARTING", CHANGE_MODIFIED),
+                 ("STARTED", CHANGE_MODIFIED),
+                 ("STOPPED", CHANGE_MODIFIED),
+                 ("STOPPING", CHANGE_MODIFIED),
+                 ("STOPPING_PRECLEAN", CHANGE_MODIFIED),
+                 ("UNINSTALLED", CHANGE_REMOVED),
+                 ("UPDATE_BEGIN", CHANGE_MODIFIED),
+                 ("UPDATE_FAILED", CHANGE_MODIFIED),
+                 ("UPDATED", CHANGE_MODIFIED))
+""" Handled bundle events: (BundleEvent kind name, change) """
+
+SERVICE_EVENTS = (("REGISTERED", CHANGE_ADDED),
+                  ("MODIFIED", CHANGE_MODIFIED),
+                  ("UNREGISTERING", CHANGE_REMOVED))
+""" Handled service events: (ServiceEvent kind name, change) """
+
 _logger = logging.getLogger(__name__)
 
 # ------------------------------------------------------------------------------
@@ -48,13 +90,34 @@ _logger = logging.getLogger(__name__)
 @ComponentFactory("basic-probe-factory")
 @Provides(core.SVC_PROBE)
 @Requires('_event', pelix.services.SERVICE_EVENT_ADMIN)
+@Requires('_handlers', pelix.services.SERVICE_EVENT_HANDLER, aggregate=True,
+          optional=True)
 @Property('_export_config', pelix.remote.PROP_EXPORTED_CONFIGS, ["jsonrpc"])
 @Property('_export_interface', pelix.remote.PROP_EXPORTED_INTERFACES,
           [core.SVC_PROBE])
+@Property('_history_size', 'probe.history.size', 1000)
+@Property('_batch_window', 'event.batch.window', 0)
+@Property('_batch_size', 'event.batch.size', 200)
 @Instantiate('basic-probe')
 class BasicProbe(object):
     """
     Basic probe
+
+    Keeps a revision counter, incremented on each bundle or service event,
+    and a bounded history of those changes, to let consoles synchronize
+    incrementally with get_changes_since().
+
+    If the event.batch.window property is set (in seconds), framework events
+    are accumulated during this window (or until event.batch.size events are
+    waiting) and posted as a single BUNDLE_EVENTS_BATCH or
+    SERVICE_EVENTS_BATCH event. Its "events" property contains the list of
+    the accumulated events, as {"topic": ..., "properties": ...} dictionaries.
+
+    Events are only posted if an event handler subscribed to their topic.
+
+    The properties of services are copied once, when the service is registered
+    or modified, then shared by the history, the events and the snapshots:
+    those dictionaries must not be modified.
     """
     def __init__(self):
         """
@@ -66,10 +129,50 @@ class BasicProbe(object):
         # EventAdmin
         self._event = None
 
+        # Event handlers: reference -> topics
+        self._handlers = None
+        self._handlers_topics = {}
+
+        # Topics with at least a subscribed handler
+        self._subscribed = frozenset()
+
+        # Event kind -> (topic, change)
+        self._bundle_topics = {}
+        self._service_topics = {}
+
+        # Service ID -> properties (shared, read-only)
+        self._properties_cache = {}
+        self._properties_lock = threading.Lock()
+
+        # Registered services: ID -> reference, and sorted IDs. Only the
+        # properties of those services are cached.
+        self._services = {}
+        self._sorted_ids = []
+
+        # IDs of the services unregistered while the live services are
+        # loaded, during the validation (None out of it)
+        self._removed_while_loading = None
+
         # Export properties
         self._export_config = None
         self._export_interface = None
 
+        # Changes history: (revision, category, ID, change, payload) tuples
+        self._history_size = 1000
+        self._history = collections.deque()
+        self._history_lock = threading.Lock()
+
+        # Current revision and revision before the oldest history entry
+        self._revision = 0
+        self._history_base = 0
+
+        # Events batching: batch topic -> waiting events
+        self._batch_window = 0
+        self._batch_size = 200
+        self._batches = {BUNDLE_EVENTS_BATCH: [], SERVICE_EVENTS_BATCH: []}
+        self._batch_lock = threading.Lock()
+        self._batch_timer = None
+
 
     def get_bundles(self):
         """
@@ -101,21 +204,304 @@ class BasicProbe(object):
             return -1
 
 
-    def get_services_info(self):
+    def get_bundles_snapshot(self):
         """
-        Retrieves the properties of all registered services in an array.
+        Retrieves the description of all installed bundles in a single call
 
+        :return: An array of dictionaries, with the "id", "name", "state" and
+                 "version" entries
+        """
+        return [{"id": bundle.get_bundle_id(),
+                 "name": bundle.get_symbolic_name(),
+                 "state": bundle.get_state(),
+                 "version": bundle.get_version()}
+                for bundle in self._context.get_bundles()]
+
+
+    def get_summary(self):
+        """
+        Retrieves the number of bundles and services, in a single call
+
+        :return: A dictionary with the "bundles" and "services" counts and the
+                 current "revision"
+        """
+        with self._properties_lock:
+            nb_services = len(self._services)
+
+        return {"bundles": len(self._context.get_bundles()),
+                "services": nb_services,
+                "revision": self._revision}
+
+
+    def get_services_info(self, ldap_filter=None, keys=None, offset=0,
+                          limit=None):
+        """
+        Retrieves the properties of the registered services in an array,
+        sorted by service ID.
+
+        :param ldap_filter: An LDAP filter the services must match (optional)
+        :param keys: The names of the properties to return (optional). The
+                     service ID is always returned.
+        :param offset: Number of services to skip
+        :param limit: Maximum number of services to return (optional)
         :return: An array of properties
         """
+        # The filter used by consoles to page services is handled with the
+        # sorted IDs, others are tested on each service, in ID order
+        first_id = 0
+        matcher = None
+        if ldap_filter:
+            match = SERVICE_ID_LOWER_BOUND.match(ldap_filter) \
+                if is_string(ldap_filter) else None
+            if match is not None:
+                first_id = int(match.group(1))
+
+            else:
+                matcher = pelix.ldapfilter.get_ldap_filter(ldap_filter)
+
+        with self._properties_lock:
+            start = bisect.bisect_left(self._sorted_ids, first_id)
+            if matcher is None:
+                # Only keep the requested page
+                start += offset
+                end = start + limit if limit is not None else None
+
+            else:
+                end = None
+
+            references = [self._services[service_id]
+                          for service_id in self._sorted_ids[start:end]]
+
+        if matcher is not None:
+            # Stop testing the services once the page is complete
+            matching = (reference for reference in references
+                        if matcher.matches(self.__get_properties(reference)))
+            end = offset + limit if limit is not None else None
+            references = list(itertools.islice(matching, offset, end))
+
+        if not keys:
+            # Keep all the properties of the service
+            return [self.__get_properties(reference)
+                    for reference in references]
+
+        # Only return the requested properties
+        keys = set(keys)
+        keys.add(pelix.constants.SERVICE_ID)
         result = []
-        references = self._context.get_all_service_references(None, None)
         for reference in references:
-            # Only keep the properties of the service
-            result.append(reference.get_properties())
+            properties = self.__get_properties(reference)
+            result.append(dict((key, properties[key])
+                               for key in keys if key in properties))
 
         return result
 
 
+    def __get_properties(self, reference, refresh=False):
+        """
+        Retrieves the cached properties of a service
+
+        :param reference: A service reference
+        :param refresh: If True, the cache entry is replaced by a new copy of
+                        the service properties
+        :return: The properties dictionary (must not be modified)
+        """
+        service_id = reference.get_property(pelix.constants.SERVICE_ID)
+        with self._properties_lock:
+            properties = None if refresh \
+                else self._properties_cache.get(service_id)
+
+            if properties is None:
+                properties = reference.get_properties()
+                if service_id in self._services:
+                    # Don't keep the entry of an unregistered service
+                    self._properties_cache[service_id] = properties
+
+            return properties
+
+
+    def __record_change(self, category, ident, change, payload):
+        """
+        Increments the revision and stores the change in the history
+
+        :param category: "bundles" or "services"
+        :param ident: Bundle or service ID
+        :param change: Kind of change (one of the CHANGE_* constants)
+        :param payload: Bundle description or service properties
+        """
+        with self._history_lock:
+            self._revision += 1
+            if len(self._history) >= self._history_size:
+                # Forget the oldest change
+                self._history_base = self._history.popleft()[0]
+
+            self._history.append((self._revision, category, ident, change,
+                                  payload))
+
+
+    def get_revision(self):
+        """
+        Retrieves the current revision of the probe state
+
+        :return: The revision number
+        """
+        return self._revision
+
+
+    def get_changes_since(self, revision):
+        """
+        Retrieves the bundles and services changes since the given revision.
+        Changes to the same bundle or service are merged.
+
+        If the history doesn't cover the given revision, the result only
+        contains the "full" flag set to True: the caller must reload the whole
+        state (get_bundles_snapshot() and get_services_info()).
+
+        :param revision: The revision known by the caller
+        :return: A dictionary with the current "revision", the "full" flag, and
+                 the "bundles" and "services" entries, each one being a
+                 dictionary of "added", "modified" (descriptions) and
+                 "removed" (IDs) lists
+        """
+        with self._history_lock:
+            current = self._revision
+            if revision < self._history_base or revision > current:
+                # Out of the history window
+                return {"revision": current, "full": True}
+
+            # Changes are stored with consecutive revisions
+            entries = list(itertools.islice(self._history,
+                                            revision - self._history_base,
+                                            None))
+
+        # Merge changes: category -> ID -> (change, payload)
+        merged = {"bundles": {}, "services": {}}
+        for _, category, ident, change, payload in entries:
+            changes = merged[category]
+            previous = changes.get(ident)
+            if previous is None:
+                changes[ident] = (change, payload)
+
+            elif change == CHANGE_REMOVED:
+                if previous[0] == CHANGE_ADDED:
+                    # Appeared and vanished since the given revision
+                    del changes[ident]
+
+                else:
+                    changes[ident] = (change, None)
+
+            elif previous[0] == CHANGE_ADDED:
+                # Still a new entry for the caller
+                changes[ident] = (CHANGE_ADDED, payload)
+
+            else:
+                changes[ident] = (change, payload)
+
+        result = {"revision": current, "full": False}
+        for category, changes in merged.items():
+            delta = {CHANGE_ADDED: [], CHANGE_MODIFIED: [], CHANGE_REMOVED: []}
+            for ident, (change, payload) in changes.items():
+                delta[change].append(ident if change == CHANGE_REMOVED
+                                     else payload)
+
+            result[category] = delta
+
+        return result
+
+
+    def __post(self, batch_topic, topic, props):
+        """
+        Posts an event, or adds it to the current batch if batching is enabled
+
+        :param batch_topic: Topic of the batch of events of this kind
+        :param topic: Topic of the event
+        :param props: Properties of the event
+        """
+        if not self._batch_window:
+            # No batching
+            self._event.post(topic, props)
+            return
+
+        with self._batch_lock:
+            batch = self._batches[batch_topic]
+            batch.append({"topic": topic, "properties": props})
+
+            if len(batch) >= self._batch_size:
+                # Batch full
+                self._batches[batch_topic] = []
+
+            else:
+                if self._batch_timer is None:
+                    # First waiting event: start the window
+                    self._batch_timer = threading.Timer(self._batch_window,
+                                                        self.__flush_batches)
+                    self._batch_timer.daemon = True
+                    self._batch_timer.start()
+
+                return
+
+        # Post the full batch (outside the lock)
+        self._event.post(batch_topic, {"events": batch})
+
+
+    def __flush_batches(self):
+        """
+        Posts all waiting batches of events
+        """
+        with self._batch_lock:
+            self._batch_timer = None
+            batches = [(batch_topic, batch)
+                       for batch_topic, batch in self._batches.items()
+                       if batch]
+
+            for batch_topic, _ in batches:
+                self._batches[batch_topic] = []
+
+        event = self._event
+        if event is not None:
+            for batch_topic, batch in batches:
+                event.post(batch_topic, {"events": batch})
+
+
+    def __update_subscriptions(self):
+        """
+        Computes the set of topics with at least one subscribed handler
+        """
+        patterns = set()
+        for topics in list(self._handlers_topics.values()):
+            if is_string(topics):
+                patterns.add(topics)
+
+            elif topics:
+                patterns.update(topics)
+
+        topics = [topic for topic, _ in self._bundle_topics.values()]
+        topics.extend(topic for topic, _ in self._service_topics.values())
+        topics.extend((BUNDLE_EVENTS_BATCH, SERVICE_EVENTS_BATCH))
+
+        self._subscribed = frozenset(
+            topic for topic in topics
+            if any(fnmatch.fnmatch(topic, pattern) for pattern in patterns))
+
+
+    @BindField('_handlers')
+    def _bind_handler(self, field, service, reference):
+        """
+        An event handler has been bound
+        """
+        self._handlers_topics[reference] = \
+            reference.get_property(pelix.services.PROP_EVENT_TOPICS)
+        self.__update_subscriptions()
+
+
+    @UnbindField('_handlers')
+    def _unbind_handler(self, field, service, reference):
+        """
+        An event handler has gone away
+        """
+        self._handlers_topics.pop(reference, None)
+        self.__update_subscriptions()
+
+
     def bundle_changed(self, event):
         """
         Notified by the framework of a bundle event
@@ -124,29 +510,30 @@ class BasicProbe(object):
             # Late callback
             return
 
-        bundle = event.get_bundle()
-        kind = event.get_kind()
-
-        # Handled events
-        events = ("INSTALLED", "STARTING", "STARTED", "STOPPED", "STOPPING",
-                  "STOPPING_PRECLEAN", "UNINSTALLED", "UPDATE_BEGIN",
-                  "UPDATE_FAILED", "UPDATED")
-        for event in events:
-            if kind == getattr(pelix.framework.BundleEvent, event):
-                event = "{0}/{1}".format(BUNDLE_EVENT_PREFIX, event)
-                break
-        else:
+        try:
+            topic, change = self._bundle_topics[event.get_kind()]
+
+        except KeyError:
             # Unknown event
             return
 
-        # Setup properties
-        props = {}
-        props['bundle.id'] = bundle.get_bundle_id()
-        props['bundle.symbolicName'] = bundle.get_symbolic_name()
-        props['bundle.state'] = bundle.get_state()
+        bundle = event.get_bundle()
+        bid = bundle.get_bundle_id()
+        name = bundle.get_symbolic_name()
+        state = bundle.get_state()
+
+        # Update the history
+        self.__record_change("bundles", bid, change,
+                             {"id": bid, "name": name, "state": state,
+                              "version": bundle.get_version()})
 
-        # Post the event
-        self._event.post(event, props)
+        if (BUNDLE_EVENTS_BATCH if self._batch_window else topic) \
+                in self._subscribed:
+            # Post the event
+            self.__post(BUNDLE_EVENTS_BATCH, topic,
+                        {'bundle.id': bid,
+                         'bundle.symbolicName': name,
+                         'bundle.state': state})
 
 
     def service_changed(self, event):
@@ -157,27 +544,49 @@ class BasicProbe(object):
             # Late callback
             return
 
+        try:
+            topic, change = self._service_topics[event.get_kind()]
+
+        except KeyError:
+            # Unknown event
+            return
+
         ref = event.get_service_reference()
-        kind = event.get_kind()
+        service_id = ref.get_property(pelix.constants.SERVICE_ID)
+        if change == CHANGE_REMOVED:
+            # Last use of the cached properties
+            with self._properties_lock:
+                if self._services.pop(service_id, None) is not None:
+                    del self._sorted_ids[bisect.bisect_left(self._sorted_ids,
+                                                            service_id)]
+                if self._removed_while_loading is not None:
+                    self._removed_while_loading.add(service_id)
+
+                properties = self._properties_cache.pop(service_id, None)
 
-        # Handled events
-        events = ("REGISTERED", "MODIFIED", "UNREGISTERING")
-        for event in events:
-            if kind == getattr(pelix.framework.ServiceEvent, event):
-                event = "{0}/{1}".format(SERVICE_EVENT_PREFIX, event)
-                break
+            if properties is None:
+                properties = ref.get_properties()
 
         else:
-            # Unknown event
-            return
+            # Registered or modified: refresh the cache
+            with self._properties_lock:
+                if service_id not in self._services:
+                    # IDs are increasing: usually appended
+                    bisect.insort(self._sorted_ids, service_id)
+
+                self._services[service_id] = ref
+
+            properties = self.__get_properties(ref, True)
 
-        # Setup the event properties
-        props = {}
-        props["service.id"] = ref.get_property(pelix.constants.SERVICE_ID)
-        props["service.properties"] = ref.get_properties()
+        # Update the history
+        self.__record_change("services", service_id, change, properties)
 
-        # Post the event
-        self._event.post(event, props)
+        if (SERVICE_EVENTS_BATCH if self._batch_window else topic) \
+                in self._subscribed:
+            # Post the event
+            self.__post(SERVICE_EVENTS_BATCH, topic,
+                        {"service.id": service_id,
+                         "service.properties": properties})
 
 
     @Validate
@@ -186,8 +595,41 @@ class BasicProbe(object):
         Component validated
         """
         self._context = context
+
+        # Prepare the event kind -> (topic, change) dictionaries
+        self._bundle_topics = dict(
+            (getattr(pelix.framework.BundleEvent, name),
+             ("{0}/{1}".format(BUNDLE_EVENT_PREFIX, name), change))
+            for name, change in BUNDLE_EVENTS)
+        self._service_topics = dict(
+            (getattr(pelix.framework.ServiceEvent, name),
+             ("{0}/{1}".format(SERVICE_EVENT_PREFIX, name), change))
+            for name, change in SERVICE_EVENTS)
+        self.__update_subscriptions()
+
+        # Start revisions from the current time, in milliseconds, so that
+        # revisions known by consoles from a previous instance are invalid
+        with self._history_lock:
+            self._history.clear()
+            self._revision = self._history_base = int(time.time() * 1000)
+
         self._context.add_bundle_listener(self)
+
+        # Load the services registered before the listener, ignoring those
+        # unregistered in the meantime
+        with self._properties_lock:
+            self._removed_while_loading = set()
+
         self._context.add_service_listener(self)
+        references = context.get_all_service_references(None, None) or ()
+        with self._properties_lock:
+            for reference in references:
+                service_id = reference.get_property(pelix.constants.SERVICE_ID)
+                if service_id not in self._removed_while_loading:
+                    self._services[service_id] = reference
+
+            self._sorted_ids = sorted(self._services)
+            self._removed_while_loading = None
 
     @Invalidate
     def invalidate(self, context):
@@ -197,3 +639,18 @@ class BasicProbe(object):
         self._context.remove_bundle_listener(self)
         self._context.remove_service_listener(self)
         self._context = None
+
+        # Send waiting events
+        with self._batch_lock:
+            if self._batch_timer is not None:
+                self._batch_timer.cancel()
+
+        self.__flush_batches()
+
+        with self._history_lock:
+            self._history.clear()
+
+        with self._properties_lock:
+            self._properties_cache.clear()
+            self._services.clear()
+            del self._sorted_ids[:]
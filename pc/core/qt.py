@@ -19,68 +19,303 @@ __docformat__ = "restructuredtext en"
 
 # ------------------------------------------------------------------------------
 
+# Local package
+from core import LANE_INTERACTIVE, LANES_NAMES
+from core.stats import UiCallsStatistics, qualified_name
+
 # PyQt 5
 import PyQt5.QtCore as QtCore
 import PyQt5.QtWidgets as QtWidgets
 
 # Standard library
+import collections
 import logging
 import sys
 import threading
+import time
 
-if sys.version_info[0] < 3:
-    import Queue as queue
-
-else:
-    import queue
+# Python 3.2+, or the "futures" back-port, which provides the same package
+from concurrent.futures import CancelledError, Future
 
 # ------------------------------------------------------------------------------
 
 _logger = logging.getLogger(__name__)
 
+# Monotonic clock, if available
+_clock = getattr(time, 'monotonic', time.time)
+
+# ------------------------------------------------------------------------------
+
+class _UiCall(object):
+    """
+    Represents a call waiting to be executed in the UI thread
+    """
+    __slots__ = ('method', 'args', 'kwargs', 'future', 'key', 'lane',
+                 'deadline', 'queued')
+
+    def __init__(self, method, args, kwargs, future, key,
+                 lane=LANE_INTERACTIVE, deadline=None):
+        """
+        Sets up members
+
+        :param method: The method to call
+        :param args: Method arguments
+        :param kwargs: Method keyword arguments
+        :param future: A Future object to notify, or None
+        :param key: Coalescing key, or None
+        :param lane: Priority lane of the call
+        :param deadline: Clock value after which the call must be dropped,
+                         or None
+        """
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.key = key
+        self.lane = lane
+        self.deadline = deadline
+        self.queued = _clock()
+
+
+    def run(self):
+        """
+        Executes the call. Must be called from the UI thread.
+        """
+        future = self.future
+        if future is None:
+            # Fire and forget call
+            try:
+                self.method(*self.args, **self.kwargs)
+
+            except Exception as ex:
+                _logger.exception("%s: %s", type(ex).__name__, ex)
+
+        elif future.set_running_or_notify_cancel():
+            # Call the method and store its result
+            try:
+                future.set_result(self.method(*self.args, **self.kwargs))
+
+            except Exception as ex:
+                future.set_exception(ex)
+
 # ------------------------------------------------------------------------------
 
 class QtLoader(QtCore.QObject):
     """
     Qt application loader.
-    Provides a run_on_ui() method to allow multithreaded application
-    construction.
-    
+    Provides the run_on_ui(), submit_on_ui() and post_on_ui() methods to allow
+    multithreaded application construction.
+
+    Waiting calls are executed by batches in the UI thread: a single pass
+    executes as many calls as possible during its time budget, then gives
+    the hand back to the Qt event loop.
+
+    Calls are queued in priority lanes (interactive, telemetry and bulk): a
+    pass always executes the calls of the highest priority lane first. Calls
+    can have a deadline, after which they are dropped instead of executed.
+
+    The waiting and execution times of queued calls are aggregated in a
+    UiCallsStatistics object, and calls slower than a threshold are logged.
+
     setup(), loop() and stop() should be called in the same thread, which should
     be the process main thread.
     """
 
     __ui_queued = QtCore.pyqtSignal()
-    """ Signals a queued method to call in the UI thread """
+    """ Signals that waiting methods must be called in the UI thread """
 
-    def __init__(self):
+    def __init__(self, time_budget=.02, slow_threshold=.1):
         """
         Sets up members
+
+        :param time_budget: Maximum time (in seconds) spent by a UI thread pass
+                            executing waiting calls
+        :param slow_threshold: Execution time (in seconds) above which a call
+                               is logged as slow (None to disable)
         """
         QtCore.QObject.__init__(self)
         self.__app = None
+        self.__time_budget = time_budget
+        self.__slow_threshold = slow_threshold
+
+        # Calls statistics
+        self.__statistics = UiCallsStatistics()
+
+        # Identifier of the UI thread
+        self.__ui_thread_id = None
+
+        # Waiting calls: one queue per lane
+        self.__lock = threading.Lock()
         self.__waiting_calls = None
+        self.__coalesced = {}
+
+        # Lanes statistics
+        self.__dropped = [0] * len(LANES_NAMES)
+        self.__merged = [0] * len(LANES_NAMES)
+
+        # A UI thread pass has been signaled
+        self.__scheduled = False
 
 
     def __ui_runner(self):
         """
-        Method called by Qt in the UI thread
+        Method called by Qt in the UI thread: executes waiting calls until the
+        queue is empty or until the time budget of the pass is consumed
         """
-        # Get the next method to call
-        method, args, kwargs, event = self.__waiting_calls.get()
+        deadline = _clock() + self.__time_budget
+        while True:
+            with self.__lock:
+                call = self.__pop_call()
+                if call is None:
+                    # Nothing left to do
+                    self.__scheduled = False
+                    return
+
+            start = _clock()
+            if call.deadline is not None and start > call.deadline:
+                # Too late: drop the call
+                self.__dropped[call.lane] += 1
+                if call.future is not None:
+                    call.future.cancel()
+                continue
+
+            call.run()
+            end = _clock()
+            self.__record(call, start, end)
+
+            if end >= deadline:
+                # Budget consumed: let Qt handle its events before continuing
+                break
+
+        # Signal another pass
+        self.__ui_queued.emit()
+
+
+    def __record(self, call, start, end):
+        """
+        Updates the statistics after the execution of a call
+
+        :param call: The executed _UiCall
+        :param start: Clock value when the call started
+        :param end: Clock value when the call ended
+        """
+        exec_time = end - start
+        self.__statistics.record(call.method, start - call.queued, exec_time)
+
+        threshold = self.__slow_threshold
+        if threshold is not None and exec_time > threshold:
+            _logger.warning("Slow UI call: %s took %.1f ms (waited %.1f ms)",
+                            qualified_name(call.method), exec_time * 1000,
+                            (start - call.queued) * 1000)
+
+
+    def __pop_call(self):
+        """
+        Pops the next call to execute, from the highest priority lane.
+        Must be called while holding the lock.
+
+        :return: A _UiCall object, or None
+        """
+        if self.__waiting_calls is None:
+            # UI stopped
+            return None
+
+        for lane in self.__waiting_calls:
+            if lane:
+                call = lane.popleft()
+                if call.key is not None:
+                    del self.__coalesced[call.key]
+
+                return call
+
+
+    def __enqueue(self, call):
+        """
+        Adds a call to the waiting list and signals it to the UI thread.
+        If a call with the same coalescing key is already waiting, it is
+        replaced by the new one.
+
+        :param call: A _UiCall object
+        :raise ValueError: The UI hasn't been set up
+        """
+        with self.__lock:
+            if self.__waiting_calls is None:
+                raise ValueError("UI not yet set up")
+
+            if call.key is not None:
+                previous = self.__coalesced.get(call.key)
+                if previous is not None:
+                    # Merge with the waiting call, keeping its position
+                    if previous.future is not None:
+                        previous.future.cancel()
+
+                    previous.method = call.method
+                    previous.args = call.args
+                    previous.kwargs = call.kwargs
+                    previous.future = call.future
+
+                    # Keep the later deadline (None being the latest)
+                    if previous.deadline is not None:
+                        previous.deadline = None if call.deadline is None \
+                            else max(previous.deadline, call.deadline)
+
+                    if call.lane < previous.lane:
+                        # Promote the call to the higher priority lane
+                        self.__waiting_calls[previous.lane].remove(previous)
+                        self.__waiting_calls[call.lane].append(previous)
+                        previous.lane = call.lane
+
+                    self.__merged[previous.lane] += 1
+                    return
+
+                self.__coalesced[call.key] = call
+
+            # Add the method to the waiting list of its lane
+            self.__waiting_calls[call.lane].append(call)
+            if self.__scheduled:
+                # A pass has already been signaled
+                return
+
+            self.__scheduled = True
+
+        # Emit to signal, to let Qt execute __ui_runner
+        self.__ui_queued.emit()
 
-        try:
-            # Call the method
-            method(*args, **kwargs)
 
-        except Exception as ex:
-            _logger.exception("%s: %s", type(ex).__name__, ex)
+    def get_statistics(self):
+        """
+        Retrieves the statistics of the calls executed in the UI thread
+
+        :return: The UiCallsStatistics object
+        """
+        return self.__statistics
+
+
+    def get_slow_threshold(self):
+        """
+        Retrieves the execution time above which a call is logged as slow
+
+        :return: A time in seconds, or None
+        """
+        return self.__slow_threshold
+
 
-        finally:
-            # Task executed
-            event.set()
-            if self.__waiting_calls is not None:
-                self.__waiting_calls.task_done()
+    def set_slow_threshold(self, threshold):
+        """
+        Sets the execution time above which a call is logged as slow
+
+        :param threshold: A time in seconds, or None to disable the log
+        """
+        self.__slow_threshold = threshold
+
+
+    def set_time_budget(self, time_budget):
+        """
+        Sets the maximum time spent by a UI thread pass executing waiting calls
+
+        :param time_budget: A time in seconds
+        """
+        self.__time_budget = time_budget
 
 
     def get_application(self):
@@ -90,27 +325,133 @@ class QtLoader(QtCore.QObject):
         return self.__app
 
 
+    def is_ui_thread(self):
+        """
+        Checks if the current thread is the UI thread
+
+        :return: True if the caller is running in the UI thread
+        """
+        return threading.current_thread().ident == self.__ui_thread_id
+
+
     def run_on_ui(self, method, *args, **kwargs):
         """
-        Runs the given method in the UI thread
+        Runs the given method in the UI thread and waits for it to be executed.
+        If the caller is the UI thread, the method is executed immediately.
+
+        :return: The result of the method, or None if the UI has been stopped
+                 before its execution
+        :raise ValueError: The UI hasn't been set up
+        :raise Exception: The exception raised by the method
         """
-        if self.__waiting_calls is None:
-            raise ValueError("UI not yet set up")
+        if self.is_ui_thread():
+            # Waiting for the UI thread from itself would be a dead lock
+            return method(*args, **kwargs)
 
-        # Make an event object
-        event = threading.Event()
+        future = self.submit_on_ui(method, *args, **kwargs)
+        try:
+            # Wait for the method to be executed before returning
+            return future.result()
 
-        # Add the method to the waiting list
-        self.__waiting_calls.put((method, args, kwargs, event))
+        except CancelledError:
+            # The UI has been stopped
+            return None
 
-        # Emit to signal, to let Qt execute __ui_runner
-        self.__ui_queued.emit()
 
-        # Force Qt to handle the event
-        self.__app.processEvents()
+    def submit_on_ui(self, method, *args, **kwargs):
+        """
+        Queues the given method to be executed in the UI thread.
+        Doesn't wait for the method to be executed, except if the caller is the
+        UI thread: in this case, the method is executed immediately.
+
+        :return: A Future object, giving access to the result of the method
+        :raise ValueError: The UI hasn't been set up
+        """
+        future = Future()
+        call = _UiCall(method, args, kwargs, future, None)
+        if self.is_ui_thread():
+            # Avoid a dead lock if the caller waits for the result
+            call.run()
+
+        else:
+            self.__enqueue(call)
+
+        return future
+
+
+    def run(self, method, *args, **kwargs):
+        """
+        Asyncio variant of run_on_ui(), to be awaited from a coroutine::
+
+            result = await qt_loader.run(method, arg1, arg2)
+
+        :return: An asyncio future, bound to the event loop of the caller
+        :raise ValueError: The UI hasn't been set up
+        """
+        # Asyncio is only required when this method is used
+        import asyncio
+        return asyncio.wrap_future(self.submit_on_ui(method, *args, **kwargs))
 
-        # Wait for the event before returning
-        event.wait()
+
+    def post_on_ui(self, method, *args, **kwargs):
+        """
+        Queues the given method to be executed in the UI thread, without any
+        way to retrieve its result (fire and forget).
+        Exceptions raised by the method are logged.
+
+        :raise ValueError: The UI hasn't been set up
+        """
+        self.__enqueue(_UiCall(method, args, kwargs, None, None))
+
+
+    def schedule_on_ui(self, method, args=None, kwargs=None, key=None,
+                       with_future=True, lane=LANE_INTERACTIVE, ttl=None):
+        """
+        Queues the given method to be executed in the UI thread.
+
+        If a key is given, the call replaces any waiting call with the same
+        key: only the latest one will be executed, at the position of the
+        first one in the queue. The future of a replaced call is cancelled.
+        The merged call keeps the later deadline of both calls, and is moved
+        to the end of the lane of the new call if it has a higher priority.
+
+        If a time to live is given, the call is dropped if it can't be started
+        before its expiration. The future of a dropped call is cancelled.
+
+        :param method: The method to call
+        :param args: Method arguments
+        :param kwargs: Method keyword arguments
+        :param key: Coalescing key (hashable), or None
+        :param with_future: If False, the call is a fire and forget one
+        :param lane: Priority lane of the call (one of the core.LANE_* constants)
+        :param ttl: Maximum time (in seconds) the call can wait, or None
+        :return: A Future object, or None if with_future is False
+        :raise ValueError: The UI hasn't been set up or invalid lane
+        """
+        if lane < 0 or lane >= len(LANES_NAMES):
+            raise ValueError("Unknown lane: {0}".format(lane))
+
+        deadline = _clock() + ttl if ttl is not None else None
+        future = Future() if with_future else None
+        self.__enqueue(_UiCall(method, tuple(args or ()), kwargs or {},
+                               future, key, lane, deadline))
+        return future
+
+
+    def get_lanes_info(self):
+        """
+        Retrieves the state of the priority lanes
+
+        :return: A dictionary: lane name -> {"depth": waiting calls,
+                 "dropped": expired calls, "merged": coalesced calls}
+        """
+        with self.__lock:
+            waiting_calls = self.__waiting_calls
+            return dict((name, {"depth": len(waiting_calls[lane])
+                                if waiting_calls is not None else 0,
+                                "dropped": self.__dropped[lane],
+                                "merged": self.__merged[lane]})
+                        for lane, name in enumerate(LANES_NAMES))
 
 
     def setup(self, argv=None):
@@ -118,14 +459,23 @@ class QtLoader(QtCore.QObject):
         Sets up the QtApplication
         """
         if self.__app is None:
+            # Keep track of the UI thread
+            self.__ui_thread_id = threading.current_thread().ident
+
             # Create the UI runner queue
-            self.__waiting_calls = queue.Queue()
+            with self.__lock:
+                self.__waiting_calls = tuple(collections.deque()
+                                             for _ in LANES_NAMES)
+                self.__coalesced.clear()
+                self.__scheduled = False
 
             # Create the QApplication object
             self.__app = QtWidgets.QApplication(argv or sys.argv)
 
-            # Connect the UI runner signal
-            self.__ui_queued.connect(self.__ui_runner)
+            # Connect the UI runner signal (always queued, to let a pass give
+            # the hand back to the event loop)
+            self.__ui_queued.connect(self.__ui_runner,
+                                     QtCore.Qt.QueuedConnection)
 
         return self.__app
 
@@ -152,15 +502,20 @@ class QtLoader(QtCore.QObject):
             self.__ui_queued.disconnect()
 
             # Exit all run_on_ui methods
-            while not self.__waiting_calls.empty():
-                waiting = self.__waiting_calls.get_nowait()
-                # Set the event (to release wait_on_ui)
-                waiting[-1].set()
-                self.__waiting_calls.task_done()
+            with self.__lock:
+                waiting_calls = self.__waiting_calls
+                self.__waiting_calls = None
+                self.__coalesced.clear()
+
+            for lane in waiting_calls:
+                for call in lane:
+                    if call.future is not None:
+                        # Cancel the future (to release run_on_ui)
+                        call.future.cancel()
 
             # Stop the UI loop
             self.__app.quit()
 
             # Clean up
             self.__app = None
-            self.__waiting_calls = None
+            self.__ui_thread_id = None
@@ -0,0 +1,243 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Defines the inverted index used to filter the rows of the details tables
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+def parse_query(query):
+    """
+    Splits a search query into lower-case terms
+
+    :param query: A search query string
+    :return: A sorted tuple of unique terms
+    """
+    if not query:
+        return ()
+
+    return tuple(sorted(set(query.lower().split())))
+
+# ------------------------------------------------------------------------------
+
+class SearchIndex(object):
+    """
+    Inverted index: token -> keys of the documents containing it.
+
+    A document matches a query if each term of the query is a sub-string of
+    at least one of its tokens. The tokens matching the terms of the current
+    query and the matching keys are kept up to date when documents are set
+    or removed, so that a change of the query only scans the vocabulary (or
+    a subset of it, when a term is refined) and never the documents.
+
+    Not thread-safe: must be used from a single thread (the UI one).
+    """
+    def __init__(self):
+        """
+        Sets up members
+        """
+        # Token -> set of keys
+        self.__postings = {}
+
+        # Key -> frozenset of tokens
+        self.__documents = {}
+
+        # Current query: terms and, for each term, the tokens matching it
+        self.__terms = ()
+        self.__terms_tokens = ()
+
+        # Keys of the matching documents (None if there is no query)
+        self.__matches = None
+
+
+    def __len__(self):
+        """
+        Returns the number of indexed documents
+        """
+        return len(self.__documents)
+
+
+    def __match_document(self, key, tokens):
+        """
+        Updates the matches set for the given document
+
+        :param key: A document key
+        :param tokens: The tokens of the document
+        """
+        if self.__matches is None:
+            return
+
+        for term_tokens in self.__terms_tokens:
+            if term_tokens.isdisjoint(tokens):
+                self.__matches.discard(key)
+                return
+
+        self.__matches.add(key)
+
+
+    def set_document(self, key, tokens):
+        """
+        Adds or updates a document
+
+        :param key: The document key
+        :param tokens: An iterable of lower-case tokens
+        """
+        tokens = frozenset(tokens)
+        old_tokens = self.__documents.get(key, frozenset())
+        if key in self.__documents and tokens == old_tokens:
+            # Nothing changed
+            return
+
+        self.__documents[key] = tokens
+        self.__remove_postings(key, old_tokens - tokens)
+
+        for token in tokens - old_tokens:
+            try:
+                self.__postings[token].add(key)
+
+            except KeyError:
+                # New token: check if it matches the current query
+                self.__postings[token] = set((key,))
+                for term, term_tokens in zip(self.__terms,
+                                             self.__terms_tokens):
+                    if term in token:
+                        term_tokens.add(token)
+
+        self.__match_document(key, tokens)
+
+
+    def remove_document(self, key):
+        """
+        Removes a document
+
+        :param key: The document key
+        :return: True if the document was known
+        """
+        try:
+            tokens = self.__documents.pop(key)
+
+        except KeyError:
+            return False
+
+        self.__remove_postings(key, tokens)
+        if self.__matches is not None:
+            self.__matches.discard(key)
+
+        return True
+
+
+    def __remove_postings(self, key, tokens):
+        """
+        Removes the given key from the postings of the given tokens
+
+        :param key: A document key
+        :param tokens: Tokens of the document to forget
+        """
+        for token in tokens:
+            keys = self.__postings[token]
+            keys.discard(key)
+            if not keys:
+                # Token not used anymore
+                del self.__postings[token]
+                for term_tokens in self.__terms_tokens:
+                    term_tokens.discard(token)
+
+
+    def clear(self):
+        """
+        Removes all documents (the current query is kept)
+        """
+        self.__postings.clear()
+        self.__documents.clear()
+        for term_tokens in self.__terms_tokens:
+            term_tokens.clear()
+
+        if self.__matches is not None:
+            self.__matches.clear()
+
+
+    def search(self, query):
+        """
+        Sets the current query
+
+        :param query: A query string (terms separated by spaces)
+        :return: The set of matching keys, or None if the query is empty
+        """
+        terms = parse_query(query)
+        if terms == self.__terms:
+            # Same query
+            return self.__matches
+
+        if not terms:
+            # No more filter
+            self.__terms = ()
+            self.__terms_tokens = ()
+            self.__matches = None
+            return None
+
+        terms_tokens = []
+        for term in terms:
+            # When a term refines a previous one (e.g. a new character has
+            # been typed), only look in the tokens matching the latter
+            candidates = self.__postings
+            for old_term, old_tokens in zip(self.__terms,
+                                            self.__terms_tokens):
+                if old_term in term and len(old_tokens) < len(candidates):
+                    candidates = old_tokens
+
+            terms_tokens.append(set(token for token in candidates
+                                    if term in token))
+
+        self.__terms = terms
+        self.__terms_tokens = tuple(terms_tokens)
+
+        # Intersect the keys matching each term, smallest set first
+        matches = None
+        for term_tokens in sorted(terms_tokens, key=len):
+            keys = set()
+            for token in term_tokens:
+                keys.update(self.__postings[token])
+
+            if matches is None:
+                matches = keys
+
+            else:
+                matches.intersection_update(keys)
+
+            if not matches:
+                break
+
+        self.__matches = matches
+        return matches
+
+
+    def get_query(self):
+        """
+        Returns the terms of the current query
+
+        :return: A tuple of terms
+        """
+        return self.__terms
+
+
+    def accepts(self, key):
+        """
+        Checks if the given document matches the current query
+
+        :param key: A document key
+        :return: True if there is no query or if the document matches it
+        """
+        return self.__matches is None or key in self.__matches
@@ -0,0 +1,142 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Defines the shell commands giving access to the UI thread statistics
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Local package
+import core
+
+# iPOPO
+from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
+    Instantiate
+import pelix.shell
+
+# ------------------------------------------------------------------------------
+
+@ComponentFactory("qt-shell-commands-factory")
+@Requires('_qt_loader', core.SVC_QT_LOADER)
+@Requires('_stats', core.SVC_QT_STATS)
+@Provides(pelix.shell.SHELL_COMMAND_SPEC)
+@Instantiate("qt-shell-commands")
+class QtCommands(object):
+    """
+    Qt loader shell commands
+    """
+    def __init__(self):
+        """
+        Sets up the component
+        """
+        # Qt loader
+        self._qt_loader = None
+
+        # UI calls statistics
+        self._stats = None
+
+
+    def get_namespace(self):
+        """
+        Retrieves the name space of this command handler
+        """
+        return "qt"
+
+
+    def get_methods(self):
+        """
+        Retrieves the list of tuples (command, method) for this command handler
+        """
+        return [("stats", self.stats),
+                ("lanes", self.lanes),
+                ("slow", self.slow),
+                ("reset", self.reset)]
+
+
+    def stats(self, io_handler, name_filter=None):
+        """
+        Prints the waiting and execution times of the UI calls (in ms)
+        """
+        headers = ('Method', 'Calls', 'Wait p50', 'Wait p99', 'Exec mean',
+                   'Exec p50', 'Exec p99', 'Exec max')
+
+        lines = []
+        for name, times in sorted(self._stats.get_statistics().items()):
+            if name_filter and name_filter not in name:
+                continue
+
+            wait = times['wait']
+            execution = times['exec']
+            lines.append([name, execution['count']]
+                         + ["{0:.3f}".format(value * 1000)
+                            for value in (wait['p50'], wait['p99'],
+                                          execution['mean'], execution['p50'],
+                                          execution['p99'], execution['max'])])
+
+        if not lines:
+            io_handler.write_line("No UI call recorded")
+            return
+
+        io_handler.write_line(io_handler.make_table(headers, lines))
+
+
+    def lanes(self, io_handler):
+        """
+        Prints the state of the UI calls priority lanes
+        """
+        headers = ('Lane', 'Depth', 'Dropped', 'Merged')
+        lanes_info = self._qt_loader.get_lanes_info()
+
+        lines = []
+        for name in core.LANES_NAMES:
+            info = lanes_info[name]
+            lines.append((name, info['depth'], info['dropped'],
+                          info['merged']))
+
+        io_handler.write_line(io_handler.make_table(headers, lines))
+
+
+    def slow(self, io_handler, threshold=None):
+        """
+        Prints or sets the slow UI calls log threshold (in ms, "off" to disable)
+        """
+        if threshold is not None:
+            if threshold == "off":
+                self._qt_loader.set_slow_threshold(None)
+
+            else:
+                try:
+                    self._qt_loader.set_slow_threshold(float(threshold) / 1000)
+
+                except ValueError:
+                    io_handler.write_line("Invalid threshold: {0}", threshold)
+                    return
+
+        threshold = self._qt_loader.get_slow_threshold()
+        if threshold is None:
+            io_handler.write_line("Slow UI calls log disabled")
+
+        else:
+            io_handler.write_line("Slow UI calls threshold: {0:.1f} ms",
+                                  threshold * 1000)
+
+
+    def reset(self, io_handler):
+        """
+        Clears the UI calls statistics
+        """
+        self._stats.reset()
+        io_handler.write_line("UI calls statistics cleared")
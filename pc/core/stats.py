@@ -0,0 +1,190 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Defines the statistics of the calls executed in the UI thread
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Standard library
+import threading
+
+# ------------------------------------------------------------------------------
+
+NB_BUCKETS = 28
+"""
+Number of buckets of an histogram. Bucket i counts the values in
+[2^(i-1), 2^i[ microseconds, the last one counts all larger values (~2 min)
+"""
+
+OTHER_CALLS = "<other>"
+""" Name of the entry grouping the calls beyond the maximum number of names """
+
+# ------------------------------------------------------------------------------
+
+def qualified_name(method):
+    """
+    Computes the qualified name of a callable: module.Class.method
+
+    :param method: A callable object
+    :return: The qualified name of the callable
+    """
+    # Unwrap bound methods
+    func = getattr(method, '__func__', method)
+    name = getattr(func, '__qualname__', None) \
+        or getattr(func, '__name__', None) or type(method).__name__
+
+    module = getattr(func, '__module__', None)
+    if module:
+        return "{0}.{1}".format(module, name)
+
+    return name
+
+# ------------------------------------------------------------------------------
+
+class Histogram(object):
+    """
+    Log2-scale histogram of durations, with a constant memory footprint
+    """
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        """
+        Sets up members
+        """
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+        self.buckets = [0] * NB_BUCKETS
+
+
+    def add(self, duration):
+        """
+        Adds a duration to the histogram
+
+        :param duration: A duration in seconds
+        """
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+        # int.bit_length() of the value in microseconds gives the bucket
+        bucket = int(duration * 1000000).bit_length()
+        self.buckets[min(bucket, NB_BUCKETS - 1)] += 1
+
+
+    def percentile(self, ratio):
+        """
+        Estimates a percentile of the durations, as the upper bound of the
+        bucket containing it
+
+        :param ratio: A ratio between 0 and 1 (0.99 for the 99th percentile)
+        :return: A duration in seconds
+        """
+        if not self.count:
+            return 0.
+
+        rank = ratio * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                # Don't go over the known maximum
+                return min((1 << bucket) / 1000000., self.max)
+
+        return self.max
+
+
+    def to_dict(self):
+        """
+        Converts the histogram to a dictionary
+
+        :return: A dictionary with count, mean, max, p50, p99 (in seconds) and
+                 the raw buckets
+        """
+        return {"count": self.count,
+                "mean": self.total / self.count if self.count else 0.,
+                "max": self.max,
+                "p50": self.percentile(.5),
+                "p99": self.percentile(.99),
+                "buckets": list(self.buckets)}
+
+# ------------------------------------------------------------------------------
+
+class UiCallsStatistics(object):
+    """
+    Aggregates the waiting and execution times of UI calls, by qualified name
+    of the called method. The number of names is bounded: calls beyond it are
+    grouped under OTHER_CALLS.
+    """
+    def __init__(self, max_names=256):
+        """
+        Sets up members
+
+        :param max_names: Maximum number of distinct names to keep
+        """
+        self.__max_names = max_names
+        self.__lock = threading.Lock()
+
+        # Name -> (wait histogram, execution histogram)
+        self.__calls = {}
+
+
+    def record(self, method, wait_time, exec_time):
+        """
+        Records the execution of a call
+
+        :param method: The called method
+        :param wait_time: Time between the queuing and the start of the call
+        :param exec_time: Execution time of the call
+        """
+        name = qualified_name(method)
+        with self.__lock:
+            try:
+                wait, execution = self.__calls[name]
+
+            except KeyError:
+                if len(self.__calls) >= self.__max_names:
+                    # Too many names
+                    name = OTHER_CALLS
+
+                wait, execution = self.__calls.setdefault(
+                    name, (Histogram(), Histogram()))
+
+            wait.add(wait_time)
+            execution.add(exec_time)
+
+
+    def get_statistics(self):
+        """
+        Retrieves the current statistics
+
+        :return: A dictionary: name -> {"wait": histogram dictionary,
+                 "exec": histogram dictionary}
+        """
+        with self.__lock:
+            return dict((name, {"wait": wait.to_dict(),
+                                "exec": execution.to_dict()})
+                        for name, (wait, execution) in self.__calls.items())
+
+
+    def reset(self):
+        """
+        Clears the statistics
+        """
+        with self.__lock:
+            self.__calls.clear()
@@ -22,13 +22,9 @@ __docformat__ = "restructuredtext en"
 # Local package
 import core
 
-# PyQt5
-import PyQt5.QtWidgets as QtWidgets
-import PyQt5.QtCore as QtCore
-
 # iPOPO
 from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
-    Property, Instantiate, Invalidate, Validate
+    Property, Instantiate, Invalidate, Validate, BindField
 from pelix.utilities import is_string
 import pelix.ipopo.constants as constants
 import pelix.remote
@@ -41,6 +37,9 @@ import logging
 
 BUNDLES_DETAILS_FACTORY = "bundles-details-factory"
 
+EVENTS_BATCH_TOPIC = "pelix/framework/BundleEvents"
+""" Topic of a batch of Bundle events, sent by the probe """
+
 _logger = logging.getLogger(__name__)
 
 # ------------------------------------------------------------------------------
@@ -158,7 +157,7 @@ class BundlesDetailsCreator(object):
         :param context: Bundle context
         """
         # Clear all known instances
-        for framework_id in self._instances.keys():
+        for framework_id in list(self._instances):
             self.delete(framework_id)
 
         self._instances.clear()
@@ -167,11 +166,12 @@ class BundlesDetailsCreator(object):
 # ------------------------------------------------------------------------------
 
 @ComponentFactory(BUNDLES_DETAILS_FACTORY)
-@Requires('_probe', core.SVC_PROBE)
+@Requires('_probe', core.SVC_PROBE, optional=True)
 @Requires('_qt_loader', core.SVC_QT_LOADER)
+@Requires('_executor', core.SVC_DETAILS_EXECUTOR)
 @Provides((core.SVC_DETAILS, pelix.services.SERVICE_EVENT_HANDLER))
 @Property('_event_handler_topic', pelix.services.PROP_EVENT_TOPICS,
-          ["pelix/framework/BundleEvent/*"])
+          ["pelix/framework/BundleEvent/*", EVENTS_BATCH_TOPIC])
 @Property('_event_handler_filter', pelix.services.PROP_EVENT_FILTER)
 @Property('_export_interface', pelix.remote.PROP_EXPORTED_INTERFACES,
           [pelix.services.SERVICE_EVENT_HANDLER])
@@ -179,6 +179,9 @@ class BundlesDetailsCreator(object):
 class BundlesDetails(object):
     """
     Bundles details
+
+    The probe is optional: the table is kept while the probe is gone, and
+    resynchronized incrementally when it comes back.
     """
     def __init__(self):
         """
@@ -190,6 +193,9 @@ class BundlesDetails(object):
         # The Qt loader
         self._qt_loader = None
 
+        # Background tasks executor
+        self._executor = None
+
         # Associated framework information component UID
         self._uid = None
 
@@ -200,9 +206,13 @@ class BundlesDetails(object):
         # Export property
         self._export_interface = None
 
-        # Table widget
+        # Table model and view
+        self._model = None
         self._table = None
 
+        # Probe revision the table is synchronized with
+        self._revision = None
+
 
     def get_uid(self):
         """
@@ -228,103 +238,206 @@ class BundlesDetails(object):
             # Late call
             return
 
+        if topic == EVENTS_BATCH_TOPIC:
+            # Batch of events
+            for event in properties.get('events') or ():
+                self.__handle_event(event['topic'], event['properties'])
+
+        else:
+            # Single event
+            self.__handle_event(topic, properties)
+
+
+    def __handle_event(self, topic, properties):
+        """
+        Updates the table according to a single event
+
+        :param topic: Topic of the event
+        :param properties: Properties of the event
+        """
         bid = properties.get('bundle.id')
         name = properties.get('bundle.symbolicName')
         state = properties.get('bundle.state')
 
+        # Only the latest update of a line has to be shown
+        key = (self, bid)
         try:
             if topic.endswith('/UNINSTALLED'):
-                self._qt_loader.run_on_ui(self.__remove_line, bid)
+                self._qt_loader.schedule_on_ui(self.__remove_line, (bid,),
+                                               key=key, with_future=False,
+                                               lane=core.LANE_BULK)
 
             else:
-                self._qt_loader.run_on_ui(self.__update_line, bid, name, state)
+                self._qt_loader.schedule_on_ui(self.__update_line,
+                                               (bid, name, state),
+                                               key=key, with_future=False,
+                                               lane=core.LANE_BULK)
 
         except ValueError:
             # Qt is gone
             pass
 
 
-    def __set_line_content(self, line, ident, *values):
+    def __update_line(self, ident, name, state):
         """
-        Sets the content of a line
+        Updates the line of the given bundle, or adds it
+
+        :param ident: Bundle ID
+        :param name: Bundle symbolic name
+        :param state: Bundle state
         """
-        # Add the identifier
-        self._table.setItem(line, 0, QtWidgets.QTableWidgetItem(str(ident)))
+        if self._model is not None:
+            self._model.set_record(ident, (ident, name, state))
 
-        # Fill it
-        for i, value in enumerate(values):
-            if value is not None:
-                item = QtWidgets.QTableWidgetItem(str(value))
-                self._table.setItem(line, i + 1, item)
 
-        # Update the columns size
-        self._table.resizeColumnsToContents()
+    def __remove_line(self, ident):
+        """
+        Removes the line associated to the given bundle
 
+        :param ident: Bundle ID
+        """
+        if self._model is not None:
+            self._model.remove_record(ident)
 
-    def __find_row(self, ident):
+
+    def __reset_lines(self, bundles):
         """
-        Gets the index of row with the given identifier
+        Replaces the content of the table
 
-        :param ident: A line identifier
-        :return: The row number or -1
+        :param bundles: A list of (ID, name, state) tuples
         """
-        ident = str(ident)
-        for item in self._table.findItems(ident, QtCore.Qt.MatchFixedString):
-            if item.column() == 0:
-                # ID match, return the row number
-                return item.row()
-        else:
-            return -1
+        if self._model is not None:
+            self._model.reset_records((bid, (bid, name, state))
+                                      for bid, name, state in bundles)
 
 
-    def __update_line(self, ident, *values):
+    def __apply_changes(self, changes):
         """
-        Updates the line with the given value.
-        The first value is the identifier of the line.
-        If the identifier is not found, a new line is created
+        Applies the changes returned by the probe get_changes_since() method
 
-        :param ident: A line identifier
-        :param values: A set of values to update
+        :param changes: A dictionary of "added", "modified" and "removed"
+                        bundles
         """
-        # Find the row with the same first value
-        row = self.__find_row(ident)
-        if row > -1:
-            # Found it, update its content
-            self.__set_line_content(row, ident, *values)
+        if self._model is None:
+            return
 
-        else:
-            # Not found, append the line
-            self.__append_line(ident, *values)
+        for key in ('added', 'modified'):
+            for bundle in changes.get(key) or ():
+                self.__update_line(bundle['id'], bundle['name'],
+                                   bundle['state'])
 
-            # Sort the lines
-            self._table.sortItems(0)
+        for bid in changes.get('removed') or ():
+            self.__remove_line(bid)
 
 
-    def __append_line(self, ident, *values):
+    @staticmethod
+    def __get_revision(probe):
         """
-        Appends a line to the table.
-        The first value is the identifier of the line.
+        Retrieves the current revision of the probe
 
-        :param ident: A line identifier
-        :param values: A set of values to add
+        :param probe: A probe service
+        :return: The revision, or None if the probe doesn't support it
         """
-        # Add the new row
-        line = self._table.rowCount()
-        self._table.insertRow(line)
+        try:
+            return probe.get_revision()
 
-        # Set its content
-        self.__set_line_content(line, ident, *values)
+        except Exception as ex:
+            # Older probe
+            _logger.debug("Probe revision not available: %s", ex)
+            return None
 
 
-    def __remove_line(self, ident):
+    @staticmethod
+    def __get_bundles(probe):
         """
-        Removes the line associated to the given identifier
+        Retrieves the description of the bundles from the probe
 
-        :param ident: A line identifier
+        :param probe: A probe service
+        :return: A list of (ID, name, state) tuples
         """
-        row = self.__find_row(ident)
-        if row > -1:
-            self._table.removeRow(row)
+        try:
+            # Single call
+            return [(bundle['id'], bundle['name'], bundle['state'])
+                    for bundle in probe.get_bundles_snapshot()]
+
+        except Exception as ex:
+            # Older probe
+            _logger.debug("Bundles snapshot not available: %s", ex)
+
+        result = []
+        for bid, name in probe.get_bundles().items():
+            # JSON-RPC converts integer keys into strings
+            if is_string(bid):
+                bid = int(bid)
+
+            # Get the state
+            result.append((bid, name, probe.get_bundle_state(bid)))
+
+        return result
+
+
+    def __resync(self, probe):
+        """
+        Synchronizes the table with the probe, after it came back: only the
+        changes since the known revision are loaded, if the probe still has
+        them.
+
+        Runs in a details executor worker.
+
+        :param probe: The probe to request
+        """
+        try:
+            changes = None
+            if self._revision is not None:
+                changes = probe.get_changes_since(self._revision)
+
+            if changes is not None and not changes.get('full'):
+                self._revision = changes['revision']
+                self._qt_loader.schedule_on_ui(self.__apply_changes,
+                                               (changes['bundles'],),
+                                               with_future=False,
+                                               lane=core.LANE_BULK)
+                return
+
+        except Exception as ex:
+            _logger.error("Error synchronizing bundles: %s", ex)
+
+        # Reload the whole table
+        self._revision = None
+        try:
+            revision = self.__get_revision(probe)
+            bundles = self.__get_bundles(probe)
+
+        except Exception as ex:
+            # Keep no revision: the next resync will reload the whole table
+            _logger.error("Error reloading bundles: %s", ex)
+            return
+
+        try:
+            self._qt_loader.schedule_on_ui(self.__reset_lines, (bundles,),
+                                           with_future=False,
+                                           lane=core.LANE_BULK)
+            self._revision = revision
+
+        except ValueError:
+            # Qt is gone
+            pass
+
+
+    @BindField('_probe')
+    def _bind_probe(self, field, service, reference):
+        """
+        The probe has been bound (back)
+        """
+        if self._model is not None:
+            # The table is shown: synchronize it, one resync at a time
+            try:
+                self._executor.submit((self._uid, BUNDLES_DETAILS_FACTORY),
+                                      self.__resync, service)
+
+            except ValueError:
+                # Workers are stopped: the component is going away
+                pass
 
 
     def get_widget(self, parent):
@@ -334,24 +447,20 @@ class BundlesDetails(object):
         :param parent: The parent UI container
         :return: A Qt widget
         """
-        # Make the table
-        self._table = QtWidgets.QTableWidget(0, 3, parent)
-        self._table.setHorizontalHeaderLabels(('ID', 'Name', 'Status'))
-        self._table.verticalHeader().hide()
-
-        # Fill it
-        for bid, name in self._probe.get_bundles().items():
-            # JSON-RPC converts integer keys into strings
-            if is_string(bid):
-                bid = int(bid)
+        # Import Qt only when the widget is built
+        import core.models
 
-            # Get the state
-            state = self._probe.get_bundle_state(bid)
-
-            # Append the line
-            self.__append_line(bid, name, state)
+        # Make the model and its sorted view
+        self._model = core.models.IndexedTableModel(('ID', 'Name', 'Status'),
+                                                    parent)
+        self._table, proxy = core.models.make_sorted_view(self._model, parent)
 
-        # Sort the lines
-        self._table.sortItems(0)
-
-        return self._table
+        # Fill it
+        probe = self._probe
+        if probe is not None:
+            self._revision = self.__get_revision(probe)
+            self.__reset_lines(self.__get_bundles(probe))
+            self._table.resizeColumnsToContents()
+
+        # Add the search box
+        return core.models.make_search_view(self._table, proxy, parent)
@@ -22,11 +22,6 @@ __docformat__ = "restructuredtext en"
 # Local package
 import core
 
-# PyQt5
-import PyQt5.QtCore as QtCore
-import PyQt5.QtGui as QtGui
-import PyQt5.QtWidgets as QtWidgets
-
 # iPOPO
 from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
     Property, Instantiate, Invalidate, Validate
@@ -37,6 +32,7 @@ import pelix.services
 # Standard library
 import logging
 import os
+import time
 
 # ------------------------------------------------------------------------------
 
@@ -163,7 +159,7 @@ class CompassDetailsCreator(object):
         :param context: Bundle context
         """
         # Clear all known instances
-        for framework_id in self._instances.keys():
+        for framework_id in list(self._instances):
             self.delete(framework_id)
 
         self._instances.clear()
@@ -171,163 +167,6 @@ class CompassDetailsCreator(object):
 
 # ------------------------------------------------------------------------------
 
-class CompassWidget(QtWidgets.QWidget):
-    """
-    Compass widget
-
-    By: epifanio
-    From: http://www.diotavelli.net/PyQtWiki/Compass%20widget
-    """
-    def __init__(self, parent=None):
-        """
-        Sets up members
-
-        :param parent: UI container
-        """
-        QtWidgets.QWidget.__init__(self, parent)
-
-        self._angle = 0.0
-        self._margins = 10
-        self._pointText = {0: "N", 45: "NE", 90: "E", 135: "SE", 180: "S",
-                           225: "SW", 270: "W", 315: "NW"}
-
-    def paintEvent(self, event):
-        """
-        Widget painting event
-        """
-        # Start painting
-        painter = QtGui.QPainter()
-        painter.begin(self)
-        painter.setRenderHint(QtGui.QPainter.Antialiasing)
-
-        # Clear the background
-        painter.fillRect(event.rect(),
-                         self.palette().brush(QtGui.QPalette.Window))
-
-        # Draw the cardinal points
-        self.drawMarkings(painter)
-
-        # Draw the needle
-        self.drawNeedle(painter)
-
-        # Stop painting
-        painter.end()
-
-
-    def drawMarkings(self, painter):
-        """
-        Draws the cardinal points
-
-        :param painter: A QPainter object
-        """
-        painter.save()
-
-        # Move to the center of the compass
-        painter.translate(self.width() / 2, self.height() / 2)
-        scale = min((self.width() - self._margins) / 120.0,
-                    (self.height() - self._margins) / 120.0)
-        painter.scale(scale, scale)
-
-        # Setup the fonts and the painter
-        font = QtGui.QFont(self.font())
-        font.setPixelSize(10)
-        metrics = QtGui.QFontMetricsF(font)
-
-        painter.setFont(font)
-        painter.setPen(QtGui.QPen(QtGui.QColor(0, 0, 0)))
-
-        i = 0
-        while i < 360:
-            if i % 45 == 0:
-                # Named direction (every 45°)
-                painter.drawLine(0, -40, 0, -50)
-                painter.drawText(-metrics.width(self._pointText[i]) / 2.0, -52,
-                                 self._pointText[i])
-            else:
-                # Small line
-                painter.drawLine(0, -45, 0, -50)
-
-            # Next line (+15°)
-            painter.rotate(15)
-            i += 15
-
-        painter.restore()
-
-
-    def drawNeedle(self, painter):
-        """
-        Draws a needle
-
-        :param painter: A QPainter object
-        """
-        painter.save()
-
-        # Move to the center of the compass
-        painter.translate(self.width() / 2, self.height() / 2)
-
-        # Rotate to the correct angle
-        painter.rotate(self._angle)
-        scale = min((self.width() - self._margins) / 120.0,
-                    (self.height() - self._margins) / 120.0)
-        painter.scale(scale, scale)
-
-        # Setup the painter
-        painter.setPen(QtGui.QPen(QtCore.Qt.NoPen))
-        painter.setBrush(self.palette().brush(QtGui.QPalette.Shadow))
-
-        # Draw the needle
-        painter.drawPolygon(
-            QtGui.QPolygon([QtCore.QPoint(-10, 0),
-                            QtCore.QPoint(0, -45),
-                            QtCore.QPoint(10, 0),
-                            QtCore.QPoint(0, 45),
-                            QtCore.QPoint(-10, 0)])
-            )
-
-        # Change color
-        painter.setBrush(QtGui.QBrush(QtGui.QColor(255, 0, 0)))
-
-        # Draw the end of the needle
-        painter.drawPolygon(
-            QtGui.QPolygon([QtCore.QPoint(-5, -25),
-                            QtCore.QPoint(0, -45),
-                            QtCore.QPoint(5, -25),
-                            QtCore.QPoint(0, -30),
-                            QtCore.QPoint(-5, -25)])
-            )
-
-        painter.restore()
-
-
-    def sizeHint(self):
-        """
-        Returns the (constant) size of the compass widget: 150x150
-        """
-        return QtCore.QSize(150, 150)
-
-
-    def angle(self):
-        """
-        Returns the current angle of the compass
-        """
-        return self._angle
-
-
-    @QtCore.pyqtSlot(float)
-    def setAngle(self, angle):
-        """
-        Sets the angle of the compass
-        """
-        if angle != self._angle:
-            self._angle = angle
-            self.angleChanged.emit(angle)
-            self.update()
-
-    angle = QtCore.pyqtProperty(float, angle, setAngle)
-    angleChanged = QtCore.pyqtSignal(float)
-
-# ------------------------------------------------------------------------------
-
 @ComponentFactory(COMPASS_DETAILS_FACTORY)
 @Requires('_compass', core.SVC_COMPASS)
 @Requires('_qt_loader', core.SVC_QT_LOADER)
@@ -338,6 +177,9 @@ class CompassWidget(QtWidgets.QWidget):
 @Property('_export_interface', pelix.remote.PROP_EXPORTED_INTERFACES,
           [pelix.services.SERVICE_EVENT_HANDLER])
 @Property('_uid', core.PROP_PROBE_UID)
+@Property('_angle_ttl', 'compass.angle.ttl', .5)
+@Property('_fps', 'compass.fps', 30)
+@Property('_smoothing', 'compass.smoothing', 0)
 class CompassDetails(object):
     """
     Compass details
@@ -362,8 +204,25 @@ class CompassDetails(object):
         # Export property
         self._export_interface = None
 
-        # Graphic view
+        # Maximum age of a shown angle value (in seconds)
+        self._angle_ttl = .5
+
+        # Maximum number of frames per second
+        self._fps = 30
+
+        # Part of the remaining arc covered at each frame (0 to disable)
+        self._smoothing = 0
+
+        # Latest received sample: (angle, reception time) tuple, replaced
+        # atomically by the EventAdmin thread and read by the UI one
+        self._latest = None
+
+        # Graphic view and its rendering timer
         self._compass_widget = None
+        self._timer = None
+
+        # Angle the needle is moving to
+        self._target = None
 
 
     def handle_event(self, topic, properties):
@@ -371,10 +230,48 @@ class CompassDetails(object):
         Notification of an event by EventAdmin
         """
         if topic.endswith("angle"):
-            # Angle update
-            if self._compass_widget is not None:
-                angle = float(properties.get('angle'))
-                self._compass_widget.setAngle(angle)
+            # Angle update: only the latest one will be shown, by the
+            # rendering timer
+            self._latest = (float(properties.get('angle')), time.time())
+
+
+    def __render(self):
+        """
+        Rendering timer tick: moves the needle to the latest received angle.
+        Called from the UI thread.
+        """
+        widget = self._compass_widget
+        if widget is None:
+            return
+
+        latest = self._latest
+        if latest is not None:
+            # Consume the sample
+            self._latest = None
+            angle, received = latest
+            if time.time() - received <= self._angle_ttl:
+                self._target = angle
+
+        if self._target is None:
+            # Nothing to show
+            return
+
+        current = widget.angle
+        if not self._smoothing:
+            # Jump to the target
+            widget.setAngle(self._target)
+            self._target = None
+            return
+
+        # Follow the shortest arc
+        delta = (self._target - current + 180) % 360 - 180
+        if abs(delta) < .5:
+            # Close enough
+            widget.setAngle(self._target)
+            self._target = None
+
+        else:
+            widget.setAngle((current + delta * min(self._smoothing, 1)) % 360)
 
 
     def get_uid(self):
@@ -400,8 +297,19 @@ class CompassDetails(object):
         :param parent: The parent UI container
         :return: A Qt widget
         """
+        # Import Qt only when the widget is built
+        import PyQt5.QtCore as QtCore
+        import widgets.compass
+
         # Load the compass image
-        self._compass_widget = CompassWidget(parent)
+        self._compass_widget = widgets.compass.CompassWidget(parent)
+
+        # Render at most at the configured frame rate, whatever the rate of
+        # the angle events
+        self._timer = QtCore.QTimer(self._compass_widget)
+        self._timer.setInterval(int(1000 / max(float(self._fps), 1)))
+        self._timer.timeout.connect(self.__render)
+        self._timer.start()
         return self._compass_widget
 
 
@@ -409,4 +317,10 @@ class CompassDetails(object):
         """
         Cleans up UI members
         """
+        if self._timer is not None:
+            self._timer.stop()
+            self._timer = None
+
         self._compass_widget = None
+        self._latest = None
+        self._target = None
@@ -22,14 +22,9 @@ __docformat__ = "restructuredtext en"
 # Local package
 import core
 
-# PyQt5
-import PyQt5.QtCore as QtCore
-import PyQt5.QtGui as QtGui
-import PyQt5.QtWidgets as QtWidgets
-
 # iPOPO
 from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
-    Property, Instantiate, Invalidate, Validate
+    Property, Instantiate, Invalidate, Validate, BindField
 import pelix.ipopo.constants as constants
 import pelix.constants
 import pelix.framework
@@ -43,6 +38,12 @@ import logging
 
 SERVICES_DETAILS_FACTORY = "services-details-factory"
 
+EVENTS_BATCH_TOPIC = "pelix/framework/ServiceEvents"
+""" Topic of a batch of Service events, sent by the probe """
+
+PAGE_SIZE = 100
+""" Number of services loaded per probe call """
+
 _logger = logging.getLogger(__name__)
 
 # ------------------------------------------------------------------------------
@@ -160,7 +161,7 @@ class ServicesDetailsCreator(object):
         :param context: Bundle context
         """
         # Clear all known instances
-        for framework_id in self._instances.keys():
+        for framework_id in list(self._instances):
             self.delete(framework_id)
 
         self._instances.clear()
@@ -169,11 +170,12 @@ class ServicesDetailsCreator(object):
 # ------------------------------------------------------------------------------
 
 @ComponentFactory(SERVICES_DETAILS_FACTORY)
-@Requires('_probe', core.SVC_PROBE)
+@Requires('_probe', core.SVC_PROBE, optional=True)
 @Requires('_qt_loader', core.SVC_QT_LOADER)
+@Requires('_executor', core.SVC_DETAILS_EXECUTOR)
 @Provides((core.SVC_DETAILS, pelix.services.SERVICE_EVENT_HANDLER))
 @Property('_event_handler_topic', pelix.services.PROP_EVENT_TOPICS,
-          ["pelix/framework/ServiceEvent/*"])
+          ["pelix/framework/ServiceEvent/*", EVENTS_BATCH_TOPIC])
 @Property('_event_handler_filter', pelix.services.PROP_EVENT_FILTER)
 @Property('_export_interface', pelix.remote.PROP_EXPORTED_INTERFACES,
           [pelix.services.SERVICE_EVENT_HANDLER])
@@ -181,6 +183,9 @@ class ServicesDetailsCreator(object):
 class ServicesDetails(object):
     """
     Services details
+
+    The probe is optional: the table is kept while the probe is gone, and
+    resynchronized incrementally when it comes back.
     """
     def __init__(self):
         """
@@ -192,6 +197,9 @@ class ServicesDetails(object):
         # The Qt loader
         self._qt_loader = None
 
+        # Background tasks executor
+        self._executor = None
+
         # Associate framework information component UID
         self._uid = None
 
@@ -202,9 +210,16 @@ class ServicesDetails(object):
         # Export property
         self._export_interface = None
 
-        # Table widget
+        # Table model and view
+        self._model = None
         self._table = None
 
+        # IDs of the services unregistered while loading the table
+        self._removed_while_loading = None
+
+        # Probe revision the table is synchronized with
+        self._revision = None
+
 
     def get_uid(self):
         """
@@ -230,150 +245,310 @@ class ServicesDetails(object):
             # Late call
             return
 
+        if topic == EVENTS_BATCH_TOPIC:
+            # Batch of events
+            for event in properties.get('events') or ():
+                self.__handle_event(event['topic'], event['properties'])
+
+        else:
+            # Single event
+            self.__handle_event(topic, properties)
+
+
+    def __handle_event(self, topic, properties):
+        """
+        Updates the table according to a single event
+
+        :param topic: Topic of the event
+        :param properties: Properties of the event
+        """
         # Get information from the event
         service_id = properties.get('service.id')
         svc_props = properties.get('service.properties')
 
-        # Extract the ID and specifications
-        _, specs = self.__extract_properties(svc_props)
-
+        # Only the latest update of a line has to be shown
+        key = (self, service_id)
         try:
             if topic.endswith('/UNREGISTERING'):
-                self._qt_loader.run_on_ui(self.__remove_line, service_id)
+                removed = self._removed_while_loading
+                if removed is not None:
+                    # Don't show it if it is in a page still to be loaded
+                    removed.add(service_id)
+
+                self._qt_loader.schedule_on_ui(self.__remove_line,
+                                               (service_id,), key=key,
+                                               with_future=False,
+                                               lane=core.LANE_BULK)
 
             else:
-                self._qt_loader.run_on_ui(self.__update_line,
-                                          service_id, specs, svc_props)
+                self._qt_loader.schedule_on_ui(self.__update_line,
+                                               (svc_props,),
+                                               key=key, with_future=False,
+                                               lane=core.LANE_BULK)
 
         except ValueError:
             # Qt is gone
             pass
 
 
-    def __extract_properties(self, properties):
+    def __update_line(self, properties):
         """
-        Extracts (and removes) the service ID and specifications from the given
-        properties.
-        Modifies the given dictionary in-place
+        Updates the line of the given service, or adds it
 
-        :param properties: A dictionary
-        :return: A (service ID, specifications) tuple
+        :param properties: The properties of the service
         """
-        keys = (pelix.constants.SERVICE_ID, pelix.constants.OBJECTCLASS)
-        result = []
+        if self._model is not None:
+            self._model.set_service(properties)
 
-        # Extract values
-        for key in keys:
-            result.append(properties.pop(key))
 
-        # Freeze the result
-        return tuple(result)
+    def __remove_line(self, ident):
+        """
+        Removes the line associated to the given service
 
+        :param ident: A service ID
+        """
+        if self._model is not None:
+            self._model.remove_record(ident)
 
-    def __set_line_content(self, line, ident, *values):
+
+    def get_widget(self, parent):
         """
-        Sets the content of a line
+        Returns the widget to be shown in the framework information panel
+
+        :param parent: The parent UI container
+        :return: A Qt widget
         """
-        # Add the identifier
-        self._table.setItem(line, 0, QtWidgets.QTableWidgetItem(str(ident)))
+        # Import Qt only when the widget is built
+        import PyQt5.QtWidgets as QtWidgets
+        import core.models
+        import widgets.services
+
+        # Make the model and its sorted view
+        self._model = widgets.services.ServicesModel(parent)
+        self._table, proxy = core.models.make_sorted_view(self._model, parent)
+
+        # Constant rows height and no word wrap: the view only has to
+        # compute the content of the visible cells
+        self._table.setWordWrap(False)
+        vertical_header = self._table.verticalHeader()
+        vertical_header.setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        vertical_header.setDefaultSectionSize(
+            self._table.fontMetrics().height() + 4)
 
         # Fill it
-        for i, value in enumerate(values):
-            if value is not None:
-                item = QtWidgets.QTableWidgetItem(str(value))
-                self._table.setItem(line, i + 1, item)
+        probe = self._probe
+        if probe is not None:
+            self._revision = self.__get_revision(probe)
+            self.__load(probe)
 
-        # Update the columns size
+        # Add the search box
+        return core.models.make_search_view(self._table, proxy, parent)
+
+
+    def __load(self, probe):
+        """
+        Fills the table with the first page of services, to be shown
+        immediately, and loads the other pages in the background. Must be
+        called from the UI thread.
+
+        :param probe: The probe to request
+        """
+        try:
+            page = probe.get_services_info(None, None, 0, PAGE_SIZE)
+            complete = len(page) < PAGE_SIZE
+
+        except Exception as ex:
+            # Older probe: no paging
+            _logger.debug("Services paging not available: %s", ex)
+            page = probe.get_services_info()
+            complete = True
+
+        self._model.reset_records(
+            (properties[pelix.constants.SERVICE_ID],
+             self._model.make_record(properties)) for properties in page)
+
+        # Size the columns according to the first page only
+        self._table.horizontalHeader().setResizeContentsPrecision(PAGE_SIZE)
         self._table.resizeColumnsToContents()
 
+        if not complete:
+            # Load the other pages in the background
+            self._removed_while_loading = set()
+            last_id = max(properties[pelix.constants.SERVICE_ID]
+                          for properties in page)
+            try:
+                self._executor.submit((self._uid, SERVICES_DETAILS_FACTORY),
+                                      self.__load_pages, probe, last_id + 1)
+
+            except ValueError:
+                # Workers are stopped: the component is going away
+                pass
 
-    def __find_row(self, ident):
+
+    def __load_pages(self, probe, first_id):
         """
-        Gets the index of row with the given identifier
+        Loads the services from the probe, page by page, starting from the
+        given service ID, and adds them to the table.
+
+        Runs in a details executor worker.
 
-        :param ident: A line identifier
-        :return: The row number or -1
+        :param probe: The probe to request
+        :param first_id: ID of the first service to load
         """
-        ident = str(ident)
-        for item in self._table.findItems(ident, QtCore.Qt.MatchFixedString):
-            if item.column() == 0:
-                # ID match, return the row number
-                return item.row()
-        else:
-            return -1
+        try:
+            while self._probe is probe:
+                # Service IDs are used as pages bounds, as the registry can
+                # change between two calls
+                page = probe.get_services_info(
+                    "({0}>={1})".format(pelix.constants.SERVICE_ID, first_id),
+                    None, 0, PAGE_SIZE)
+
+                if page:
+                    self._qt_loader.schedule_on_ui(self.__add_page, (page,),
+                                                   with_future=False,
+                                                   lane=core.LANE_BULK)
 
+                if len(page) < PAGE_SIZE:
+                    # Last page
+                    break
 
-    def __update_line(self, ident, *values):
+                first_id = max(properties[pelix.constants.SERVICE_ID]
+                               for properties in page) + 1
+
+        except Exception as ex:
+            _logger.error("Error loading services: %s", ex)
+
+        finally:
+            try:
+                self._qt_loader.schedule_on_ui(self.__end_loading,
+                                               with_future=False,
+                                               lane=core.LANE_BULK)
+
+            except (AttributeError, ValueError):
+                # Qt is gone
+                pass
+
+
+    def __add_page(self, page):
         """
-        Updates the line with the given value.
-        The first value is the identifier of the line.
-        If the identifier is not found, a new line is created
+        Adds a page of services to the table. Must be called from the UI
+        thread.
 
-        :param ident: A line identifier
-        :param values: A set of values to update
+        :param page: A list of service properties
         """
-        # Find the row with the same first value
-        row = self.__find_row(ident)
-        if row > -1:
-            # Found it, update its content
-            self.__set_line_content(row, ident, *values)
+        if self._model is None:
+            # UI gone
+            return
 
-        else:
-            # Not found, append the line
-            self.__append_line(ident, *values)
+        removed = self._removed_while_loading or ()
+        for properties in page:
+            if properties[pelix.constants.SERVICE_ID] not in removed:
+                self._model.set_service(properties)
+
+
+    def __clear_lines(self):
+        """
+        Removes all the lines of the table. Must be called from the UI thread.
+        """
+        if self._model is not None:
+            self._model.reset_records(())
 
 
-    def __append_line(self, ident, *values):
+    def __apply_changes(self, changes):
         """
-        Appends a line to the table.
-        The first value is the identifier of the line.
+        Applies the changes returned by the probe get_changes_since() method.
+        Must be called from the UI thread.
 
-        :param ident: A line identifier
-        :param values: A set of values to add
+        :param changes: A dictionary of "added", "modified" (properties) and
+                        "removed" (IDs) services
         """
-        # Add the new row
-        line = self._table.rowCount()
-        self._table.insertRow(line)
+        if self._model is None:
+            return
 
-        # Set its content
-        self.__set_line_content(line, ident, *values)
+        for key in ('added', 'modified'):
+            for properties in changes.get(key) or ():
+                self._model.set_service(properties)
 
-        # Sort the lines
-        self._table.sortItems(0)
+        for service_id in changes.get('removed') or ():
+            self._model.remove_record(service_id)
 
 
-    def __remove_line(self, ident):
+    @staticmethod
+    def __get_revision(probe):
         """
-        Removes the line associated to the given identifier
+        Retrieves the current revision of the probe
 
-        :param ident: A line identifier
+        :param probe: A probe service
+        :return: The revision, or None if the probe doesn't support it
         """
-        row = self.__find_row(ident)
-        if row > -1:
-            self._table.removeRow(row)
+        try:
+            return probe.get_revision()
 
+        except Exception as ex:
+            # Older probe
+            _logger.debug("Probe revision not available: %s", ex)
+            return None
 
-    def get_widget(self, parent):
+
+    def __resync(self, probe):
         """
-        Returns the widget to be shown in the framework information panel
+        Synchronizes the table with the probe, after it came back: only the
+        changes since the known revision are loaded, if the probe still has
+        them.
 
-        :param parent: The parent UI container
-        :return: A Qt widget
+        Runs in a details executor worker.
+
+        :param probe: The probe to request
         """
-        # Headers
-        headers = ('ID', 'Specifications', 'Properties')
+        try:
+            changes = None
+            if self._revision is not None:
+                changes = probe.get_changes_since(self._revision)
+
+            if changes is not None and not changes.get('full'):
+                self._revision = changes['revision']
+                self._qt_loader.schedule_on_ui(self.__apply_changes,
+                                               (changes['services'],),
+                                               with_future=False,
+                                               lane=core.LANE_BULK)
+                return
+
+        except Exception as ex:
+            _logger.error("Error synchronizing services: %s", ex)
+
+        # Reload the whole table, page by page
+        self._revision = self.__get_revision(probe)
+        self._removed_while_loading = set()
+        try:
+            self._qt_loader.schedule_on_ui(self.__clear_lines,
+                                           with_future=False,
+                                           lane=core.LANE_BULK)
 
-        # Make the table
-        self._table = QtWidgets.QTableWidget(0, len(headers), parent)
-        self._table.setHorizontalHeaderLabels(headers)
-        self._table.verticalHeader().hide()
+        except ValueError:
+            # Qt is gone
+            return
 
-        # Fill it
-        for properties in self._probe.get_services_info():
-            # Extract the ID and specifications
-            sid, specs = self.__extract_properties(properties)
+        self.__load_pages(probe, 0)
 
-            # Append the line
-            self.__append_line(sid, specs, properties)
 
-        return self._table
+    @BindField('_probe')
+    def _bind_probe(self, field, service, reference):
+        """
+        The probe has been bound (back)
+        """
+        if self._model is not None:
+            # The table is shown: synchronize it, one resync at a time
+            try:
+                self._executor.submit((self._uid, SERVICES_DETAILS_FACTORY),
+                                      self.__resync, service)
+
+            except ValueError:
+                # Workers are stopped: the component is going away
+                pass
+
+
+    def __end_loading(self):
+        """
+        All pages have been loaded. Must be called from the UI thread.
+        """
+        self._removed_while_loading = None
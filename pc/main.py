@@ -3,7 +3,10 @@
 """
 Pelix/Qt application bootstrap.
 
-Loads Qt in the main thread and starts a Pelix framework in a second one
+Loads Qt in the main thread and starts a Pelix framework in a second one.
+With the --asyncio option, an asyncio event loop is also started, in a third
+thread: the main frame then updates the frameworks summaries by calling their
+probes concurrently.
 
 :author: Thomas Calmant
 :copyright: Copyright 2013, isandlaTech
@@ -91,6 +94,7 @@ def run_framework(framework, http_port, on_stop):
             context.install_bundle("core.frame").start()
             context.install_bundle('core.framework_info').start()
             context.install_bundle('core.probe').start()
+            context.install_bundle('core.shell').start()
 
         bundles, _ = context.install_package('./details')
         for bundle in bundles:
@@ -106,22 +110,16 @@ def run_framework(framework, http_port, on_stop):
 
 # ------------------------------------------------------------------------------
 
-def main(args=None):
+def run_console(http_port, use_asyncio=False, on_ready=None):
     """
-    Loads Qt and the framework.
-    Blocks while Qt or the framework are running.
-    """
-    if args is None:
-        args = sys.argv[1:]
-
-    # Get arguments
-    parser = argparse.ArgumentParser(description="Pelix-Qt demo")
-    parser.add_argument("-p", "--port", type=int, dest="http_port",
-                        default=8080, metavar="PORT",
-                        help="Port of the HTTP server")
-    options = parser.parse_args(args)
-    http_port = options.http_port
+    Sets up Qt and the framework, and runs the Qt loop until the framework
+    stops.
 
+    :param http_port: Port of the HTTP server
+    :param use_asyncio: If True, provide an asyncio event loop to components
+    :param on_ready: Method called with the framework, before the Qt loop
+                     starts, from the UI thread (optional)
+    """
     # Prepare Qt (import the package as late as possible)
     import core.qt
     qt_loader = core.qt.QtLoader()
@@ -130,9 +128,21 @@ def main(args=None):
     # Prepare the framework + iPOPO + shell)
     framework = pelix.framework.create_framework(BUNDLES)
 
-    # Register QtLoader as a service
+    # Register QtLoader and its statistics as services
     context = framework.get_bundle_context()
     context.register_service(core.SVC_QT_LOADER, qt_loader, {})
+    context.register_service(core.SVC_QT_STATS, qt_loader.get_statistics(),
+                             {})
+
+    if use_asyncio:
+        # Prepare the asyncio event loop
+        import core.aio
+        asyncio_loader = core.aio.AsyncioLoader()
+        asyncio_loader.setup()
+        context.register_service(core.SVC_ASYNCIO_LOADER, asyncio_loader, {})
+
+    else:
+        asyncio_loader = None
 
     # Run the framework in a new thread
     thread = threading.Thread(target=run_framework, args=(framework,
@@ -140,6 +150,9 @@ def main(args=None):
                                                           qt_loader.stop))
     thread.start()
 
+    if on_ready is not None:
+        on_ready(framework)
+
     # Run the Qt loop (blocking)
     qt_loader.loop()
 
@@ -147,9 +160,29 @@ def main(args=None):
     framework.stop()
     thread.join(1)
 
-    thread = None
-    framework = None
-    qt_loader = None
+    if asyncio_loader is not None:
+        # Stop the asyncio event loop
+        asyncio_loader.stop()
+
+
+def main(args=None):
+    """
+    Loads Qt and the framework.
+    Blocks while Qt or the framework are running.
+    """
+    if args is None:
+        args = sys.argv[1:]
+
+    # Get arguments
+    parser = argparse.ArgumentParser(description="Pelix-Qt demo")
+    parser.add_argument("-p", "--port", type=int, dest="http_port",
+                        default=8080, metavar="PORT",
+                        help="Port of the HTTP server")
+    parser.add_argument("--asyncio", action="store_true", dest="use_asyncio",
+                        help="Provide an asyncio event loop to components, and "
+                        "call the probes of the overview concurrently")
+    options = parser.parse_args(args)
+    run_console(options.http_port, options.use_asyncio)
 
 # ------------------------------------------------------------------------------
 
@@ -3,7 +3,7 @@
 """
 Pelix remote framework test
 
-Starts a framework with a fake compass service
+Starts a framework with one or more fake compass services
 
 :author: Thomas Calmant
 :copyright: Copyright 2013, isandlaTech
@@ -59,6 +59,10 @@ def main(args=None):
     parser.add_argument("-p", "--port", type=int, dest="http_port",
                         default=8081, metavar="PORT",
                         help="Port of the HTTP server")
+    parser.add_argument("-c", "--compasses", type=int, default=1,
+                        metavar="NB", help="Number of fake compasses")
+    parser.add_argument("-t", "--tick", type=float, default=.1,
+                        help="Clock tick of the fake compasses (in seconds)")
     options = parser.parse_args(args)
     http_port = options.http_port
 
@@ -90,8 +94,22 @@ def main(args=None):
 
     # Install other bundles
     context.install_bundle('core.probe').start()
+    context.install_bundle('utils.scheduler').start()
     context.install_bundle('utils.fake_compass').start()
 
+    # Instantiate the other fake compasses, sharing the scheduler thread
+    with use_ipopo(context) as ipopo:
+        if options.tick != .1:
+            # Replace the default instance
+            ipopo.kill("fake-compass")
+            ipopo.instantiate("fake-compass-event-sender-factory",
+                              "fake-compass", {"clock.tick": options.tick})
+
+        for index in range(1, options.compasses):
+            ipopo.instantiate("fake-compass-event-sender-factory",
+                              "fake-compass-{0}".format(index),
+                              {"clock.tick": options.tick})
+
     # Wait for stop then delete the framework
     framework.wait_for_stop()
 
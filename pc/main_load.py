@@ -0,0 +1,325 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Console load generator
+
+Starts N Pelix frameworks, each in its own process (a process can only host
+one framework), with a BasicProbe and a configurable number of synthetic
+bundles and services, which are periodically restarted and replaced.
+
+The main process runs a sink framework whose exported event handler counts
+the events posted by the probes, as a console would receive them, and prints
+the ingestion throughput. Use --no-sink to load a running console instead: each
+worker then counts the events its probe posts, and the reported throughput is
+the one sent to the console.
+
+The workers are forked before the sink framework is created, as a child
+process can't start a framework if it inherited a running one.
+
+Discovery uses multicast, whose packets are looped back to the local host:
+all frameworks and the console can run on the same machine. Use --group and
+--mcast-port to isolate the load test from other frameworks.
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Pelix
+from pelix.ipopo.constants import use_ipopo
+import pelix.framework
+import pelix.remote
+
+# Standard library
+import argparse
+import logging
+import multiprocessing
+import sys
+import time
+
+# ------------------------------------------------------------------------------
+
+BUNDLES = ("pelix.ipopo.core",
+           "pelix.http.basic",
+           "pelix.remote.dispatcher",
+           "pelix.remote.registry",
+           "pelix.remote.json_rpc",
+           "pelix.remote.discovery.multicast",
+           "pelix.services.eventadmin")
+""" Bundles to install in each Pelix framework """
+
+# ------------------------------------------------------------------------------
+
+def start_framework(http_port, options):
+    """
+    Starts a framework with EventAdmin and Remote Services
+
+    :param http_port: Port of the HTTP server
+    :param options: Parsed command line options
+    :return: The started framework
+    """
+    framework = pelix.framework.create_framework(BUNDLES)
+    context = framework.get_bundle_context()
+    framework.start()
+
+    # Multicast configuration
+    discovery = {}
+    if options.group:
+        discovery["multicast.group"] = options.group
+
+    if options.mcast_port:
+        discovery["multicast.port"] = options.mcast_port
+
+    with use_ipopo(context) as ipopo:
+        # EventAdmin
+        ipopo.instantiate("pelix-services-eventadmin-factory",
+                          "pelix-services-eventadmin", {})
+
+        # HTTP Service
+        ipopo.instantiate("pelix.http.service.basic.factory",
+                          "pelix.http.service.basic",
+                          {"pelix.http.port": http_port})
+
+        # Remote services
+        ipopo.instantiate("pelix-remote-dispatcher-servlet-factory",
+                          "pelix-remote-dispatcher-servlet", {})
+        ipopo.instantiate("pelix-jsonrpc-exporter-factory",
+                          "pelix-jsonrpc-exporter", {})
+        ipopo.instantiate("pelix-jsonrpc-importer-factory",
+                          "pelix-jsonrpc-importer", {})
+        ipopo.instantiate("pelix-remote-discovery-multicast-factory",
+                          "pelix-remote-discovery-multicast", discovery)
+
+    return framework
+
+
+def install_load(framework, options):
+    """
+    Installs the probe and the load generator in the given framework
+
+    :param framework: A started framework
+    :param options: Parsed command line options
+    """
+    context = framework.get_bundle_context()
+    context.install_bundle('core.probe').start()
+    context.install_bundle('utils.scheduler').start()
+    context.install_bundle('utils.load').start()
+
+    with use_ipopo(context) as ipopo:
+        ipopo.instantiate("load-generator-factory", "load-generator",
+                          {"load.bundles": options.bundles,
+                           "load.services": options.services,
+                           "load.churn": options.churn})
+
+
+def install_counter(framework, exported=True):
+    """
+    Installs an event counter in the given framework
+
+    :param framework: A started framework
+    :param exported: If False, the counter only receives the events posted in
+                     its framework
+    :return: The event counter component
+    """
+    properties = {}
+    if not exported:
+        properties[pelix.remote.PROP_EXPORTED_INTERFACES] = None
+
+    context = framework.get_bundle_context()
+    context.install_bundle('utils.load').start()
+    with use_ipopo(context) as ipopo:
+        return ipopo.instantiate("load-event-counter-factory",
+                                 "load-event-counter", properties)
+
+
+def run_worker(index, options, stop_event, counts):
+    """
+    Runs a loaded framework until the stop event is set.
+
+    Executed in a child process.
+
+    :param index: Index of the worker
+    :param options: Parsed command line options
+    :param stop_event: A multiprocessing Event
+    :param counts: A multiprocessing Array where to store the number of
+                   events posted by the probe (None to not count them)
+    """
+    framework = start_framework(options.http_port + index, options)
+    try:
+        install_load(framework, options)
+        if counts is None:
+            stop_event.wait()
+
+        else:
+            # Count the events posted by the probe, locally
+            counter = install_counter(framework, False)
+            while not stop_event.wait(options.interval / 2.):
+                counts[index] = counter.get_statistics()["events"]
+
+    finally:
+        framework.stop()
+        pelix.framework.FrameworkFactory.delete_framework(framework)
+
+
+class WorkersCounter(object):
+    """
+    Provides the statistics of the events counted by the workers, like the
+    event counter service
+    """
+    def __init__(self, counts):
+        """
+        :param counts: The multiprocessing Array filled by the workers
+        """
+        self._counts = counts
+        self._start = time.time()
+
+
+    def get_statistics(self):
+        """
+        Retrieves the events counted by the workers
+
+        :return: A dictionary: {"duration": seconds, "events": total count,
+                 "frameworks": number of counting workers}
+        """
+        counts = self._counts[:]
+        return {"duration": time.time() - self._start,
+                "events": sum(counts),
+                "frameworks": sum(1 for count in counts if count)}
+
+# ------------------------------------------------------------------------------
+
+def report(counter, previous):
+    """
+    Prints the current ingestion throughput
+
+    :param counter: The event counter service
+    :param previous: Statistics of the previous report (or None)
+    :return: The current statistics
+    """
+    stats = counter.get_statistics()
+    if previous is None:
+        previous = {"duration": 0, "events": 0}
+
+    elapsed = stats["duration"] - previous["duration"]
+    received = stats["events"] - previous["events"]
+    print("{0:7.1f}s frameworks={1:4d} events={2:9d} rate={3:9.1f}/s "
+          "mean={4:9.1f}/s"
+          .format(stats["duration"], stats["frameworks"], stats["events"],
+                  received / elapsed if elapsed else 0.,
+                  stats["events"] / stats["duration"]
+                  if stats["duration"] else 0.))
+    return stats
+
+
+def main(args=None):
+    """
+    Starts the loaded frameworks and reports the ingestion throughput
+    """
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="Pelix-Qt console load "
+                                     "generator")
+    parser.add_argument("-n", "--frameworks", type=int, default=10,
+                        help="Number of loaded frameworks")
+    parser.add_argument("-b", "--bundles", type=int, default=10,
+                        help="Number of synthetic bundles per framework")
+    parser.add_argument("-s", "--services", type=int, default=50,
+                        help="Number of synthetic services per framework")
+    parser.add_argument("-c", "--churn", type=float, default=1.0,
+                        help="Bundle restarts and service replacements per "
+                        "second, per framework")
+    parser.add_argument("-d", "--duration", type=float, default=60,
+                        help="Duration of the test (in seconds)")
+    parser.add_argument("-i", "--interval", type=float, default=5,
+                        help="Interval between two reports (in seconds)")
+    parser.add_argument("-p", "--port", type=int, dest="http_port",
+                        default=9000, metavar="PORT",
+                        help="HTTP port of the first framework (the sink "
+                        "uses the previous one)")
+    parser.add_argument("--group", help="Multicast group of the discovery")
+    parser.add_argument("--mcast-port", type=int, dest="mcast_port",
+                        help="Multicast port of the discovery")
+    parser.add_argument("--no-sink", action="store_false", dest="sink",
+                        help="Load a console instead of a local sink, and "
+                        "report the events posted by the workers")
+    parser.add_argument("--in-process", action="store_true",
+                        dest="in_process",
+                        help="Run a single loaded framework in this process, "
+                        "counting its events locally (no remote calls)")
+    options = parser.parse_args(args)
+
+    if options.in_process:
+        # Single framework: the probe posts to the local counter
+        framework = start_framework(options.http_port, options)
+        install_load(framework, options)
+        workers = []
+        stop_event = None
+        counter = install_counter(framework)
+
+    else:
+        # Without sink, the workers count the events they post
+        counts = None if options.sink \
+            else multiprocessing.Array('L', options.frameworks)
+
+        # Start the loaded frameworks before the sink one: a forked process
+        # can't start a framework while it inherits a running one
+        stop_event = multiprocessing.Event()
+        workers = [multiprocessing.Process(target=run_worker,
+                                           args=(index, options, stop_event,
+                                                 counts),
+                                           name="load-worker-{0}"
+                                           .format(index))
+                   for index in range(options.frameworks)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+
+        if options.sink:
+            # Count the received events
+            framework = start_framework(options.http_port - 1, options)
+            counter = install_counter(framework)
+
+        else:
+            framework = None
+            counter = WorkersCounter(counts)
+
+    try:
+        stats = None
+        end = time.time() + options.duration
+        while time.time() < end:
+            time.sleep(min(options.interval, max(end - time.time(), 0)))
+            stats = report(counter, stats)
+
+    except KeyboardInterrupt:
+        # Stop early
+        pass
+
+    finally:
+        if stop_event is not None:
+            stop_event.set()
+
+        for worker in workers:
+            worker.join(5)
+            if worker.is_alive():
+                worker.terminate()
+
+        if framework is not None:
+            framework.stop()
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,26 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Qt Designer forms of the console.
+
+The ``.ui`` files are compiled to Python modules (``<name>_ui.py``), which
+aren't versioned: they are regenerated when the ``.ui`` file is newer. To
+compile them ahead of time, from the ``pc`` folder::
+
+    python -m ui.forms
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
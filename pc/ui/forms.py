@@ -0,0 +1,159 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Compiles the Qt Designer forms to Python modules, and loads them.
+
+Loading a compiled form only costs a module import, whereas uic.loadUi()
+parses the XML file and builds the widgets by introspection on each launch.
+
+Usage (from the ``pc`` folder)::
+
+    python -m ui.forms [--force]
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Standard library
+import argparse
+import glob
+import importlib
+import logging
+import os
+import sys
+
+# ------------------------------------------------------------------------------
+
+FORMS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+""" Folder containing the .ui files and their compiled modules """
+
+MODULE_SUFFIX = "_ui"
+""" Suffix of the compiled modules names """
+
+_logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+
+def get_paths(name):
+    """
+    Returns the paths of a form and of its compiled module
+
+    :param name: Name of the form, e.g. "main" for "main.ui"
+    :return: A (.ui path, .py path) tuple
+    """
+    return (os.path.join(FORMS_FOLDER, name + ".ui"),
+            os.path.join(FORMS_FOLDER, name + MODULE_SUFFIX + ".py"))
+
+
+def is_outdated(name):
+    """
+    Checks if the compiled module of a form is missing or older than the form
+
+    :param name: Name of the form
+    :return: True if the form must be compiled
+    """
+    ui_path, py_path = get_paths(name)
+    try:
+        return os.path.getmtime(py_path) < os.path.getmtime(ui_path)
+
+    except OSError:
+        # No compiled module
+        return True
+
+
+def compile_form(name):
+    """
+    Compiles a form to a Python module. The module is written in a temporary
+    file first, so that a concurrent import never sees a partial module.
+
+    :param name: Name of the form
+    :return: The path to the compiled module
+    """
+    # Import uic only when a form must be compiled
+    import PyQt5.uic as uic
+
+    ui_path, py_path = get_paths(name)
+    tmp_path = "{0}.{1}.tmp".format(py_path, os.getpid())
+    try:
+        with open(tmp_path, "w") as py_file:
+            uic.compileUi(ui_path, py_file)
+
+        if os.path.exists(py_path):
+            # Windows can't rename over an existing file
+            os.remove(py_path)
+
+        os.rename(tmp_path, py_path)
+
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    _logger.debug("Compiled form %s to %s", ui_path, py_path)
+    return py_path
+
+
+def load_form(name):
+    """
+    Imports the compiled module of a form, compiling it first if it is
+    outdated
+
+    :param name: Name of the form
+    :return: The compiled module, containing the Ui_<top widget name> class
+    :raise IOError: The form can't be compiled and has never been
+    """
+    if is_outdated(name):
+        try:
+            compile_form(name)
+
+        except (IOError, OSError) as ex:
+            if not os.path.exists(get_paths(name)[1]):
+                raise
+
+            # Read-only folder: keep the previous module
+            _logger.warning("Can't update the compiled form %s: %s", name, ex)
+
+        # Forget the cached state of the folder (Python 3)
+        invalidate_caches = getattr(importlib, "invalidate_caches", None)
+        if invalidate_caches is not None:
+            invalidate_caches()
+
+    return importlib.import_module(
+        "{0}.{1}{2}".format(__package__ or "ui", name, MODULE_SUFFIX))
+
+# ------------------------------------------------------------------------------
+
+def main(args=None):
+    """
+    Compiles the forms of the console
+    """
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="Qt forms compiler")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="Compile all forms, even up-to-date ones")
+    options = parser.parse_args(args)
+
+    for ui_path in sorted(glob.glob(os.path.join(FORMS_FOLDER, "*.ui"))):
+        name = os.path.splitext(os.path.basename(ui_path))[0]
+        if options.force or is_outdated(name):
+            print("{0} -> {1}".format(ui_path, compile_form(name)))
+
+        else:
+            print("{0}: up to date".format(ui_path))
+
+
+if __name__ == "__main__":
+    main()
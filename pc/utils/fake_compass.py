@@ -3,7 +3,8 @@
 """
 Compass event sender
 
-Sends fake compass events via EventAdmin every 10th of second.
+Sends fake compass events via EventAdmin every clock tick (10th of second by
+default), using the shared scheduler service.
 
 :author: Thomas Calmant
 :copyright: Copyright 2013, isandlaTech
@@ -21,6 +22,9 @@ __docformat__ = "restructuredtext en"
 
 # ------------------------------------------------------------------------------
 
+# Local package
+from utils.scheduler import SVC_SCHEDULER
+
 # Pelix
 from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
     Property, Instantiate, Validate, Invalidate
@@ -30,7 +34,6 @@ import pelix.services
 # Standard library
 import logging
 import random
-import threading
 
 # ------------------------------------------------------------------------------
 
@@ -44,7 +47,8 @@ _logger = logging.getLogger(__name__)
 @ComponentFactory("fake-compass-event-sender-factory")
 @Provides(SVC_COMPASS)
 @Requires('_event', pelix.services.SERVICE_EVENT_ADMIN)
-@Property('_tick', 'clock.tick', 1.0)
+@Requires('_scheduler', SVC_SCHEDULER)
+@Property('_tick', 'clock.tick', .1)
 @Property('_export_config', pelix.remote.PROP_EXPORTED_CONFIGS, ["jsonrpc"])
 @Property('_export_interface', pelix.remote.PROP_EXPORTED_INTERFACES,
           [SVC_COMPASS])
@@ -60,11 +64,17 @@ class FakeCompassEventSender(object):
         # EventAdmin
         self._event = None
 
+        # Scheduler service
+        self._scheduler = None
+
+        # Clock tick (in seconds)
+        self._tick = .1
+
         # Previous value
         self._value = 0
 
         # The clock
-        self._timer = None
+        self._task = None
 
         # Export properties
         self._export_config = None
@@ -84,12 +94,6 @@ class FakeCompassEventSender(object):
 
         # Post the event
         self._event.post(ANGLE_TOPIC, {"angle": angle})
-
-        # Continue the ticks
-        if self._timer is not None:
-            self._timer = threading.Timer(.1, self._clock_tick)
-            self._timer.start()
-
         return True
 
 
@@ -113,8 +117,8 @@ class FakeCompassEventSender(object):
         self._value = random.randint(0, 359)
 
         # Start the sensor
-        self._timer = threading.Timer(.1, self._clock_tick)
-        self._timer.start()
+        self._task = self._scheduler.schedule_periodic(self._clock_tick,
+                                                       self._tick)
 
 
     @Invalidate
@@ -123,5 +127,5 @@ class FakeCompassEventSender(object):
         Component invalidated
         """
         # Stop the clock
-        self._timer.cancel()
-        self._timer = None
+        self._task.cancel()
+        self._task = None
@@ -0,0 +1,266 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Load generation components
+
+* LoadGenerator installs synthetic bundles and registers synthetic services
+  in its framework, then periodically starts/stops those bundles and
+  registers/unregisters those services.
+* EventCounter is an exported event handler counting the framework events it
+  receives, i.e. the events a console would have to ingest.
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Local package
+from utils.scheduler import SVC_SCHEDULER
+
+# Pelix
+from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
+    Property, Validate, Invalidate
+import pelix.framework
+import pelix.remote
+import pelix.services
+
+# Standard library
+import logging
+import random
+import sys
+import threading
+import time
+import types
+
+# ------------------------------------------------------------------------------
+
+SVC_EVENT_COUNTER = "utils.load.counter"
+""" Specification of the event counter service """
+
+SYNTHETIC_SPEC = "load.synthetic.spec{0}"
+""" Format of the specifications of the synthetic services """
+
+NB_SPECS = 10
+""" Number of distinct synthetic specifications """
+
+_logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+
+def make_synthetic_module(name):
+    """
+    Makes an empty module, which can be installed as a bundle
+
+    :param name: Name of the module
+    :return: The name of the module
+    """
+    if name not in sys.modules:
+        sys.modules[name] = types.ModuleType(name)
+
+    return name
+
+# ------------------------------------------------------------------------------
+
+@ComponentFactory("load-generator-factory")
+@Requires('_scheduler', SVC_SCHEDULER)
+@Property('_nb_bundles', 'load.bundles', 10)
+@Property('_nb_services', 'load.services', 50)
+@Property('_churn', 'load.churn', 1.0)
+class LoadGenerator(object):
+    """
+    Synthetic bundles and services generator
+    """
+    def __init__(self):
+        """
+        Sets up members
+        """
+        # Scheduler service
+        self._scheduler = None
+
+        # Configuration
+        self._nb_bundles = 10
+        self._nb_services = 50
+        self._churn = 1.0
+
+        # Bundle context
+        self._context = None
+
+        # Synthetic bundles and service registrations
+        self._bundles = []
+        self._registrations = []
+
+        # Number of registered services (used as index)
+        self._count = 0
+
+        # Scheduled tasks
+        self._tasks = []
+
+
+    def __register_service(self):
+        """
+        Registers a synthetic service
+
+        :return: The service registration
+        """
+        index = self._count
+        self._count += 1
+        return self._context.register_service(
+            SYNTHETIC_SPEC.format(index % NB_SPECS), object(),
+            {"load.index": index,
+             "load.name": "synthetic-service-{0}".format(index)})
+
+
+    def __populate(self):
+        """
+        Installs the synthetic bundles and registers the synthetic services.
+        Called from the scheduler thread.
+        """
+        prefix = "load.synthetic.bundle{0}".format(id(self))
+        for index in range(int(self._nb_bundles)):
+            name = make_synthetic_module("{0}_{1}".format(prefix, index))
+            bundle = self._context.install_bundle(name)
+            bundle.start()
+            self._bundles.append(bundle)
+
+        for _ in range(int(self._nb_services)):
+            self._registrations.append(self.__register_service())
+
+        if self._churn > 0:
+            self._tasks.append(self._scheduler.schedule_periodic(
+                self.__churn, 1. / float(self._churn)))
+
+
+    def __churn(self):
+        """
+        Replaces a service or restarts a bundle. Called from the scheduler
+        thread.
+        """
+        if self._bundles and random.random() < .2:
+            # Restart a bundle: one event per stopping and starting step
+            bundle = random.choice(self._bundles)
+            bundle.stop()
+            bundle.start()
+
+        elif self._registrations:
+            # Replace a service: UNREGISTERING and REGISTERED events
+            index = random.randrange(len(self._registrations))
+            self._registrations[index].unregister()
+            self._registrations[index] = self.__register_service()
+
+
+    @Validate
+    def validate(self, context):
+        """
+        Component validated
+        """
+        self._context = context
+        self._count = 0
+
+        # Avoid installing bundles from the validation callback
+        self._tasks.append(self._scheduler.schedule(self.__populate, 0))
+
+
+    @Invalidate
+    def invalidate(self, context):
+        """
+        Component invalidated
+        """
+        for task in self._tasks:
+            task.cancel()
+
+        del self._tasks[:]
+
+        for registration in self._registrations:
+            try:
+                registration.unregister()
+
+            except pelix.framework.BundleException:
+                # Already unregistered
+                pass
+
+        for bundle in self._bundles:
+            try:
+                bundle.uninstall()
+
+            except pelix.framework.BundleException:
+                # Already gone
+                pass
+
+        del self._registrations[:]
+        del self._bundles[:]
+        self._context = None
+
+# ------------------------------------------------------------------------------
+
+@ComponentFactory("load-event-counter-factory")
+@Provides((SVC_EVENT_COUNTER, pelix.services.SERVICE_EVENT_HANDLER))
+@Property('_event_handler_topic', pelix.services.PROP_EVENT_TOPICS,
+          ["pelix/framework/*"])
+@Property('_export_interface', pelix.remote.PROP_EXPORTED_INTERFACES,
+          [pelix.services.SERVICE_EVENT_HANDLER])
+class EventCounter(object):
+    """
+    Counts the received framework events, per sender framework
+    """
+    def __init__(self):
+        """
+        Sets up members
+        """
+        # Event handler
+        self._event_handler_topic = None
+
+        # Export property
+        self._export_interface = None
+
+        # Framework UID -> number of events
+        self._counts = {}
+        self._lock = threading.Lock()
+
+        # Counting start time
+        self._start = None
+
+
+    def handle_event(self, topic, properties):
+        """
+        Notification of an event by EventAdmin
+        """
+        # A batch counts for all its events
+        events = properties.get('events')
+        count = len(events) if events is not None else 1
+
+        uid = properties.get(pelix.services.EVENT_PROP_FRAMEWORK_UID)
+        with self._lock:
+            self._counts[uid] = self._counts.get(uid, 0) + count
+
+
+    def get_statistics(self):
+        """
+        Retrieves the events counted since the component validation
+
+        :return: A dictionary: {"duration": seconds, "events": total count,
+                 "frameworks": number of sender frameworks}
+        """
+        with self._lock:
+            return {"duration": time.time() - self._start,
+                    "events": sum(self._counts.values()),
+                    "frameworks": len(self._counts)}
+
+
+    @Validate
+    def validate(self, context):
+        """
+        Component validated
+        """
+        self._counts.clear()
+        self._start = time.time()
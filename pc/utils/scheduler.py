@@ -0,0 +1,229 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Shared scheduler service
+
+Executes delayed and periodic tasks from a single thread, ordered by
+deadline in a heap.
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Pelix
+from pelix.ipopo.decorators import ComponentFactory, Provides, Instantiate, \
+    Validate, Invalidate
+
+# Standard library
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+# ------------------------------------------------------------------------------
+
+SVC_SCHEDULER = "utils.scheduler"
+""" Specification of the scheduler service """
+
+_clock = getattr(time, 'monotonic', time.time)
+""" Clock used to compute deadlines """
+
+_logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+
+class ScheduledTask(object):
+    """
+    Handle of a scheduled task
+    """
+    __slots__ = ('method', 'args', 'kwargs', 'period', 'deadline', 'cancelled')
+
+    def __init__(self, method, args, kwargs, period, deadline):
+        """
+        Sets up members
+
+        :param method: Method to call
+        :param args: Method arguments
+        :param kwargs: Method keyword arguments
+        :param period: Period of the task (None for a one-shot task)
+        :param deadline: Clock time of the next execution
+        """
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.period = period
+        self.deadline = deadline
+        self.cancelled = False
+
+
+    def cancel(self):
+        """
+        Cancels the task: it won't be executed anymore
+        """
+        self.cancelled = True
+
+# ------------------------------------------------------------------------------
+
+@ComponentFactory("scheduler-factory")
+@Provides(SVC_SCHEDULER)
+@Instantiate("scheduler")
+class Scheduler(object):
+    """
+    Scheduler: a single thread executing the tasks of all its consumers
+    """
+    def __init__(self):
+        """
+        Sets up members
+        """
+        # Heap of (deadline, sequence, task) tuples
+        self.__heap = []
+        self.__sequence = itertools.count()
+        self.__condition = threading.Condition()
+
+        # Execution thread
+        self.__thread = None
+        self.__running = False
+
+
+    def __push(self, task):
+        """
+        Adds a task to the heap. Must be called with the condition held.
+
+        :param task: A ScheduledTask
+        """
+        heapq.heappush(self.__heap,
+                       (task.deadline, next(self.__sequence), task))
+        if self.__heap[0][2] is task:
+            # New first task: wake up the thread
+            self.__condition.notify()
+
+
+    def schedule(self, method, delay, *args, **kwargs):
+        """
+        Calls the given method once, after the given delay
+
+        :param method: Method to call
+        :param delay: Delay before the call (in seconds)
+        :return: A ScheduledTask handle
+        """
+        task = ScheduledTask(method, args, kwargs, None, _clock() + delay)
+        with self.__condition:
+            self.__push(task)
+
+        return task
+
+
+    def schedule_periodic(self, method, period, delay=None, *args, **kwargs):
+        """
+        Calls the given method every period.
+
+        The deadlines are computed from the previous deadline, not from the
+        end of the previous call, to avoid drifting. If the scheduler is late
+        by more than a period, the missed calls are skipped.
+
+        :param method: Method to call
+        :param period: Period of the calls (in seconds)
+        :param delay: Delay before the first call (one period by default)
+        :return: A ScheduledTask handle
+        :raise ValueError: Invalid period
+        """
+        period = float(period)
+        if period <= 0:
+            raise ValueError("Invalid period: {0}".format(period))
+
+        if delay is None:
+            delay = period
+
+        task = ScheduledTask(method, args, kwargs, period, _clock() + delay)
+        with self.__condition:
+            self.__push(task)
+
+        return task
+
+
+    def __run(self):
+        """
+        Scheduler thread loop
+        """
+        heap = self.__heap
+        while True:
+            with self.__condition:
+                while self.__running:
+                    if heap:
+                        # Wait for the next deadline
+                        timeout = heap[0][0] - _clock()
+                        if timeout <= 0:
+                            break
+
+                    else:
+                        timeout = None
+
+                    self.__condition.wait(timeout)
+
+                if not self.__running:
+                    return
+
+                task = heapq.heappop(heap)[2]
+                if task.cancelled:
+                    continue
+
+                if task.period is not None:
+                    # Drift-corrected next deadline
+                    now = _clock()
+                    task.deadline += task.period
+                    if task.deadline <= now:
+                        # Too late: skip the missed calls
+                        task.deadline = now + task.period \
+                            - (now - task.deadline) % task.period
+
+                    self.__push(task)
+
+            # Call the task outside the lock
+            try:
+                task.method(*task.args, **task.kwargs)
+
+            except Exception as ex:
+                _logger.exception("Error calling scheduled task %s: %s",
+                                  task.method, ex)
+
+
+    @Validate
+    def validate(self, context):
+        """
+        Component validated: starts the scheduler thread
+        """
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run, name="scheduler")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+
+    @Invalidate
+    def invalidate(self, context):
+        """
+        Component invalidated: stops the scheduler thread and forgets all
+        tasks
+        """
+        with self.__condition:
+            self.__running = False
+            for _, _, task in self.__heap:
+                task.cancel()
+
+            del self.__heap[:]
+            self.__condition.notify()
+
+        self.__thread.join(1)
+        self.__thread = None
@@ -0,0 +1,24 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Qt widgets and models of the details components.
+
+Those modules import PyQt5: the details components only import them when
+their widget is built for the first time, to keep Qt out of the bundles
+installation.
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
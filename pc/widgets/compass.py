@@ -0,0 +1,216 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Compass widget
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# PyQt5
+import PyQt5.QtCore as QtCore
+import PyQt5.QtGui as QtGui
+import PyQt5.QtWidgets as QtWidgets
+
+# ------------------------------------------------------------------------------
+
+class CompassWidget(QtWidgets.QWidget):
+    """
+    Compass widget
+
+    By: epifanio
+    From: http://www.diotavelli.net/PyQtWiki/Compass%20widget
+
+    The dial is rendered once in a pixmap, kept until the size, the palette
+    or the font of the widget changes: a repaint only draws that pixmap and
+    the rotated needle.
+    """
+    # Needle body and tip, in the 120x120 compass coordinates
+    NEEDLE = QtGui.QPolygon([QtCore.QPoint(-10, 0),
+                             QtCore.QPoint(0, -45),
+                             QtCore.QPoint(10, 0),
+                             QtCore.QPoint(0, 45),
+                             QtCore.QPoint(-10, 0)])
+    NEEDLE_TIP = QtGui.QPolygon([QtCore.QPoint(-5, -25),
+                                 QtCore.QPoint(0, -45),
+                                 QtCore.QPoint(5, -25),
+                                 QtCore.QPoint(0, -30),
+                                 QtCore.QPoint(-5, -25)])
+    NEEDLE_TIP_BRUSH = QtGui.QBrush(QtGui.QColor(255, 0, 0))
+
+    def __init__(self, parent=None):
+        """
+        Sets up members
+
+        :param parent: UI container
+        """
+        QtWidgets.QWidget.__init__(self, parent)
+
+        self._angle = 0.0
+        self._margins = 10
+        self._pointText = {0: "N", 45: "NE", 90: "E", 135: "SE", 180: "S",
+                           225: "SW", 270: "W", 315: "NW"}
+
+        # Cached dial and the key it was rendered for
+        self._dial = None
+        self._dial_key = None
+
+    def paintEvent(self, event):
+        """
+        Widget painting event
+        """
+        # Start painting
+        painter = QtGui.QPainter()
+        painter.begin(self)
+
+        # Draw the background and the cardinal points
+        painter.drawPixmap(0, 0, self.dial())
+
+        # Draw the needle
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        self.drawNeedle(painter)
+
+        # Stop painting
+        painter.end()
+
+
+    def dial(self):
+        """
+        Returns the pixmap of the dial, rendering it if necessary
+
+        :return: A QPixmap covering the widget
+        """
+        palette = self.palette()
+        ratio = self.devicePixelRatioF()
+        key = (self.width(), self.height(), ratio, palette.cacheKey(),
+               self.font().key())
+        if key != self._dial_key:
+            # Size, palette or font changed: render the dial
+            dial = QtGui.QPixmap(self.size() * ratio)
+            dial.setDevicePixelRatio(ratio)
+            dial.fill(palette.color(QtGui.QPalette.Window))
+
+            painter = QtGui.QPainter()
+            painter.begin(dial)
+            painter.setRenderHint(QtGui.QPainter.Antialiasing)
+            self.drawMarkings(painter)
+            painter.end()
+
+            self._dial = dial
+            self._dial_key = key
+
+        return self._dial
+
+
+    def drawMarkings(self, painter):
+        """
+        Draws the cardinal points
+
+        :param painter: A QPainter object
+        """
+        painter.save()
+
+        # Move to the center of the compass
+        painter.translate(self.width() / 2, self.height() / 2)
+        scale = min((self.width() - self._margins) / 120.0,
+                    (self.height() - self._margins) / 120.0)
+        painter.scale(scale, scale)
+
+        # Setup the fonts and the painter
+        font = QtGui.QFont(self.font())
+        font.setPixelSize(10)
+        metrics = QtGui.QFontMetricsF(font)
+
+        painter.setFont(font)
+        painter.setPen(QtGui.QPen(QtGui.QColor(0, 0, 0)))
+
+        i = 0
+        while i < 360:
+            if i % 45 == 0:
+                # Named direction (every 45°)
+                painter.drawLine(0, -40, 0, -50)
+                painter.drawText(
+                    QtCore.QPointF(-metrics.width(self._pointText[i]) / 2.0,
+                                   -52), self._pointText[i])
+            else:
+                # Small line
+                painter.drawLine(0, -45, 0, -50)
+
+            # Next line (+15°)
+            painter.rotate(15)
+            i += 15
+
+        painter.restore()
+
+
+    def drawNeedle(self, painter):
+        """
+        Draws a needle
+
+        :param painter: A QPainter object
+        """
+        painter.save()
+
+        # Move to the center of the compass
+        painter.translate(self.width() / 2, self.height() / 2)
+
+        # Rotate to the correct angle
+        painter.rotate(self._angle)
+        scale = min((self.width() - self._margins) / 120.0,
+                    (self.height() - self._margins) / 120.0)
+        painter.scale(scale, scale)
+
+        # Setup the painter
+        painter.setPen(QtGui.QPen(QtCore.Qt.NoPen))
+        painter.setBrush(self.palette().brush(QtGui.QPalette.Shadow))
+
+        # Draw the needle
+        painter.drawPolygon(self.NEEDLE)
+
+        # Change color
+        painter.setBrush(self.NEEDLE_TIP_BRUSH)
+
+        # Draw the end of the needle
+        painter.drawPolygon(self.NEEDLE_TIP)
+
+        painter.restore()
+
+
+    def sizeHint(self):
+        """
+        Returns the (constant) size of the compass widget: 150x150
+        """
+        return QtCore.QSize(150, 150)
+
+
+    def angle(self):
+        """
+        Returns the current angle of the compass
+        """
+        return self._angle
+
+
+    @QtCore.pyqtSlot(float)
+    def setAngle(self, angle):
+        """
+        Sets the angle of the compass
+        """
+        if angle != self._angle:
+            self._angle = angle
+            self.angleChanged.emit(angle)
+            self.update()
+
+    angle = QtCore.pyqtProperty(float, angle, setAngle)
+    angleChanged = QtCore.pyqtSignal(float)
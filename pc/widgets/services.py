@@ -0,0 +1,113 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Services table model
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: GPLv2
+:version: 0.1
+:status: Alpha
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(map(str, __version_info__))
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Local package
+import core.models
+
+# Pelix
+import pelix.constants
+
+# ------------------------------------------------------------------------------
+
+HIDDEN_PROPERTIES = (pelix.constants.SERVICE_ID, pelix.constants.OBJECTCLASS)
+""" Properties shown in their own column """
+
+# ------------------------------------------------------------------------------
+
+class ServicesModel(core.models.IndexedTableModel):
+    """
+    Services table model.
+
+    Records are (service ID, specifications, properties) tuples, where
+    properties is the raw dictionary received from the probe: the text of the
+    cells is only computed when a view needs it, i.e. for visible rows.
+    """
+    def __init__(self, parent=None):
+        """
+        Sets up members
+
+        :param parent: Parent QObject
+        """
+        core.models.IndexedTableModel.__init__(
+            self, ('ID', 'Specifications', 'Properties'), parent)
+
+
+    def format_cell(self, record, column):
+        """
+        Returns the text to show in a cell
+        """
+        if column == 1:
+            # Specifications
+            return ", ".join(record[1] or ())
+
+        elif column == 2:
+            # Properties, without those shown in other columns
+            return str(dict((key, value)
+                            for key, value in record[2].items()
+                            if key not in HIDDEN_PROPERTIES))
+
+        return str(record[0])
+
+
+    def sort_value(self, record, column):
+        """
+        Returns the value used to sort a column
+        """
+        if column == 0:
+            # Numeric sort
+            return record[0]
+
+        return self.format_cell(record, column)
+
+
+    def tokens(self, record):
+        """
+        Returns the search tokens of a service: its ID, its specifications
+        and its "key=value" properties
+        """
+        tokens = [str(record[0])]
+        tokens.extend(spec.lower() for spec in record[1] or ())
+        tokens.extend("{0}={1}".format(key, value).lower()
+                      for key, value in record[2].items()
+                      if key not in HIDDEN_PROPERTIES)
+        return tokens
+
+
+    def set_service(self, properties):
+        """
+        Updates or adds the row of a service
+
+        :param properties: The properties of the service (not copied)
+        """
+        service_id = properties[pelix.constants.SERVICE_ID]
+        self.set_record(service_id, self.make_record(properties))
+
+
+    @staticmethod
+    def make_record(properties):
+        """
+        Makes the record of a service
+
+        :param properties: The properties of the service (not copied)
+        :return: A record tuple
+        """
+        return (properties[pelix.constants.SERVICE_ID],
+                properties.get(pelix.constants.OBJECTCLASS), properties)